@@ -0,0 +1,40 @@
+"""
+Compare :func:`garlic.utils.decode_utc` against
+:meth:`datetime.datetime.strptime`, for distinct timestamps and for
+timestamps repeated as in a details document.
+"""
+import datetime as dt
+import random
+import timeit
+
+from garlic import utils
+
+N = 50_000
+
+if __name__ == "__main__":
+    start = dt.datetime(2020, 1, 1)
+    distinct = [
+        (start + dt.timedelta(seconds=random.randrange(10 ** 8))).strftime(
+            utils.UTC_FORMAT
+        )
+        for _ in range(N)
+    ]
+    repeated = [random.choice(distinct[:100]) for _ in range(N)]
+
+    for name, timestamps in (("distinct", distinct), ("repeated", repeated)):
+        baseline = timeit.timeit(
+            lambda: [dt.datetime.strptime(t, utils.UTC_FORMAT) for t in timestamps],
+            number=5,
+        )
+        utils.decode_utc.cache_clear()
+        decoded = timeit.timeit(
+            lambda: [utils.decode_utc(t) for t in timestamps], number=5
+        )
+        assert [utils.decode_utc(t) for t in timestamps] == [
+            dt.datetime.strptime(t, utils.UTC_FORMAT) for t in timestamps
+        ]
+        print(
+            f"{name}: strptime {baseline / (5 * N) * 1e6:.2f}us, "
+            f"decode_utc {decoded / (5 * N) * 1e6:.2f}us, "
+            f"{baseline / decoded:.1f}x faster"
+        )
@@ -0,0 +1,86 @@
+"""
+Report the memory held by each descriptor object, excluding the values of
+its fields, compared to an equivalent object with a `__dict__` as
+descriptors were stored before they declared `__slots__`.
+"""
+import dataclasses
+import datetime as dt
+import tracemalloc
+
+from garlic import types
+
+N = 10_000
+
+
+def unslotted(cls: type) -> type:
+    """
+    Equivalent of `cls` storing its fields in a `__dict__`.
+    """
+    if dataclasses.is_dataclass(cls) and dataclasses.fields(cls):
+        return dataclasses.make_dataclass(
+            cls.__name__,
+            [
+                (field.name, field.type, dataclasses.field(default=None))
+                for field in dataclasses.fields(cls)
+            ],
+        )
+    return type(cls.__name__, (), {"__init__": cls.__init__})
+
+
+def measure(factory) -> float:
+    """
+    Average size (bytes) of the objects created by `factory`.
+    """
+    tracemalloc.start()
+    objects = [factory() for _ in range(N)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return size / N
+
+
+if __name__ == "__main__":
+    now = dt.datetime.utcnow()
+    history = {"first": now, "last": now, "interval": dt.timedelta(hours=1)}
+    samples = [
+        (types.RelaySummary, dict(nickname="", fingerprint="", addresses=[], running=True)),
+        (
+            types.RelayDetails,
+            dict(
+                nickname="",
+                fingerprint="",
+                or_addresses=[],
+                last_seen=now,
+                last_changed_address_or_port=now,
+                first_seen=now,
+                running=True,
+                consensus_weight=0,
+            ),
+        ),
+        (types.PartialRelayDetails, dict(fingerprint="")),
+        (
+            types.BridgeDetails,
+            dict(
+                nickname="",
+                hashed_fingerprint="",
+                or_addresses=[],
+                last_seen=now,
+                first_seen=now,
+                running=True,
+            ),
+        ),
+        (types.GraphHistory, dict(**history, factor=1.0, values=[])),
+        (types.RelayBandwidth, dict(fingerprint="")),
+        (types.RelayWeight, dict(fingerprint="")),
+        (types.RelayUptime, dict(fingerprint="")),
+    ]
+
+    for cls, kwargs in samples:
+        slotted = measure(lambda: cls(**kwargs))
+        before = unslotted(cls)
+        dictionary = measure(lambda: before(**kwargs))
+        print(
+            f"{cls.__name__}: {dictionary:.0f} bytes with __dict__, "
+            f"{slotted:.0f} bytes with __slots__ "
+            f"({1 - slotted / dictionary:.0%} smaller)"
+        )
@@ -17,9 +17,9 @@ async def main() -> None:
         v4_policy = "Allows Exits" if relay.exit_policy_summary else "Rejects All"
         v6_policy = "Allows Exits" if relay.exit_policy_v6_summary else "Rejects All"
 
-        has_http = 80 in relay.exit_policy_summary.accept_policy
+        has_http = 80 in relay.exit_policy_summary
         if not has_http and relay.exit_policy_v6_summary:
-            has_http = 80 in relay.exit_policy_v6_summary.accept_policy
+            has_http = 80 in relay.exit_policy_v6_summary
 
         print(
             f"{relay.fingerprint}\t{exit_addr}\t{v4_policy}"
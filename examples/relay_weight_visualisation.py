@@ -1,5 +1,4 @@
 import garlic
-import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 import seaborn as sns
@@ -17,22 +16,16 @@ def graph_weights(relay: garlic.RelayWeight) -> None:
     guard_prob = relay.guard_probability["1_month"]
     exit_prob = relay.exit_probability["1_month"]
 
-    middle_prob.denormalise()
-    guard_prob.denormalise()
-    exit_prob.denormalise()
-
-    x = [middle_prob.first]
-    previous = middle_prob.first
-    while (current := previous + middle_prob.interval) <= middle_prob.last:
-        x.append(current)
-        previous = current
+    # matplotlib depends on NumPy, so histories are arrays which are scaled
+    # element-wise.
+    x = middle_prob.timestamps
 
     fig, ax = plt.subplots()
     fig.suptitle("Relay Weights (1 Month Period)")
 
     ax.plot_date(
         x,
-        [x * 100 for x in guard_prob.values],
+        guard_prob.to_array() * 100,
         "o-",
         color="skyblue",
         linewidth=2,
@@ -41,7 +34,7 @@ def graph_weights(relay: garlic.RelayWeight) -> None:
     )
     ax.plot_date(
         x,
-        [x * 100 for x in middle_prob.values],
+        middle_prob.to_array() * 100,
         "o-",
         color="mediumvioletred",
         linewidth=2,
@@ -50,7 +43,7 @@ def graph_weights(relay: garlic.RelayWeight) -> None:
     )
     ax.plot_date(
         x,
-        [x * 100 for x in exit_prob.values],
+        exit_prob.to_array() * 100,
         "o-",
         color="darkolivegreen",
         linewidth=2,
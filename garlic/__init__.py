@@ -7,6 +7,17 @@ Garlic - An asynchronous Python 3.8+ API Wrapper for Onionoo.
     :toctree:
 
     client
+    cache
+    stream
+    index
+    snapshot
+    query
+    diff
+    history
+    archive
+    export
+    retry
+    ratelimit
     types
     exc
     utils
@@ -15,10 +26,12 @@ from garlic.client import Client
 
 from garlic.types import (
     Flag,
+    PortRanges,
     ExitPolicy,
     RelaySummary,
     BridgeSummary,
     RelayDetails,
+    LazyRelayDetails,
     PartialRelayDetails,
     BridgeDetails,
     PartialBridgeDetails,
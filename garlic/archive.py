@@ -0,0 +1,569 @@
+"""
+Implementation of :class:`Archive`, a binary format for documents which is
+memory-mapped when opened.
+
+.. currentmodule:: garlic.archive
+
+An archive holds the descriptors of each of the `relays` and `bridges` of a
+document as columns, one per field:
+
+* integers as `int64`, with :data:`INT_NULL` in place of null values,
+* floating point numbers as `float64`, with NaN in place of null values,
+* booleans as `int8`, with -1 in place of null values,
+* strings as `uint32` indices into a table of distinct strings, with
+  :data:`STRING_NULL` in place of null values,
+* any other value, such as lists, timestamps, exit policies and histories,
+  as a tagged binary encoding addressed by an array of `uint64` offsets.
+
+Fixed-width columns are written in the byte order of the machine, and are
+exposed without copying by :meth:`ArchiveSection.column`.
+"""
+
+import array
+import dataclasses
+import datetime as dt
+import functools
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+
+from collections.abc import Sequence
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from garlic import types, utils
+from garlic.types import (
+    ExitPolicy,
+    Flag,
+    GraphHistory,
+    LazyRelayDetails,
+    PortRanges,
+    RelayDetails,
+    Response,
+)
+
+#: First bytes of every archive.
+MAGIC = b"GARLIC\x01\n"
+
+#: Null value of integer columns.
+INT_NULL = -(2 ** 63)
+
+#: Null value of string columns.
+STRING_NULL = 2 ** 32 - 1
+
+# magic, then the offset and length of the header.
+_PREAMBLE = struct.Struct("<8sQQ")
+
+_EPOCH = dt.datetime(1970, 1, 1)
+_MICROSECOND = dt.timedelta(microseconds=1)
+
+# typecode of the array of each fixed-width column kind.
+_TYPECODES = {"int": "q", "float": "d", "bool": "b", "str": "I"}
+
+_U32 = struct.Struct("<I")
+_I64 = struct.Struct("<q")
+_F64 = struct.Struct("<d")
+
+
+@functools.lru_cache(maxsize=4096)
+def _datetime(microseconds: int) -> dt.datetime:
+    # documents repeat the same timestamps for many descriptors.
+    return _EPOCH + microseconds * _MICROSECOND
+
+
+def _kind(values: List[Any]) -> str:
+    """
+    Kind of the column storing `values`.
+    """
+    kinds = {type(value) for value in values if value is not None}
+    if kinds == {bool}:
+        return "bool"
+    if kinds == {int}:
+        return "int"
+    if kinds == {float}:
+        return "float"
+    if kinds == {str}:
+        return "str"
+    return "object"
+
+
+class _Encoder:
+    """
+    Encodes values into the tagged binary encoding, collecting the string
+    table.
+    """
+
+    def __init__(self):
+        self.strings: Dict[str, int] = {}
+
+    def string(self, value: str) -> int:
+        return self.strings.setdefault(value, len(self.strings))
+
+    def encode(self, value: Any, out: bytearray) -> None:
+        if value is None:
+            out += b"N"
+        elif value is True:
+            out += b"T"
+        elif value is False:
+            out += b"F"
+        elif isinstance(value, Flag):
+            out += b"f" + _U32.pack(self.string(value.value))
+        elif isinstance(value, int):
+            out += b"i" + _I64.pack(value)
+        elif isinstance(value, float):
+            out += b"d" + _F64.pack(value)
+        elif isinstance(value, str):
+            out += b"s" + _U32.pack(self.string(value))
+        elif isinstance(value, dt.datetime):
+            out += b"t" + _I64.pack((value - _EPOCH) // _MICROSECOND)
+        elif isinstance(value, dt.timedelta):
+            out += b"D" + _I64.pack(value // _MICROSECOND)
+        elif isinstance(value, (list, tuple)):
+            out += b"l" + _U32.pack(len(value))
+            for item in value:
+                self.encode(item, out)
+        elif isinstance(value, dict):
+            out += b"m" + _U32.pack(len(value))
+            for key, item in value.items():
+                self.encode(key, out)
+                self.encode(item, out)
+        elif isinstance(value, PortRanges):
+            out += b"p" + _U32.pack(len(value.ranges))
+            for first, last in value.ranges:
+                out += _U32.pack(first) + _U32.pack(last)
+        elif isinstance(value, ExitPolicy):
+            out += b"e"
+            self.encode(value.accept_policy, out)
+            self.encode(value.reject_policy, out)
+        elif isinstance(value, GraphHistory):
+            out += b"g"
+            values = value.values
+            if not isinstance(values, list):
+                # NumPy array, whose null values are NaN.
+                values = [None if item != item else item for item in values.tolist()]
+            for item in (
+                value.first,
+                value.last,
+                value.interval,
+                value.factor,
+                value.count,
+                values,
+            ):
+                self.encode(item, out)
+        else:
+            raise TypeError(f"cannot archive {type(value).__name__} values")
+
+
+class _Decoder:
+    """
+    Decodes values of the tagged binary encoding from a buffer.
+    """
+
+    def __init__(self, buffer, strings: "_Strings"):
+        self.buffer = buffer
+        self.strings = strings
+
+    def decode(self, offset: int) -> Tuple[Any, int]:
+        """
+        Value at `offset`, and the offset following it.
+        """
+        buffer = self.buffer
+        tag = buffer[offset : offset + 1]
+        offset += 1
+
+        if tag == b"N":
+            return None, offset
+        if tag == b"T":
+            return True, offset
+        if tag == b"F":
+            return False, offset
+        if tag == b"f":
+            return Flag(self.strings[_U32.unpack_from(buffer, offset)[0]]), offset + 4
+        if tag == b"i":
+            return _I64.unpack_from(buffer, offset)[0], offset + 8
+        if tag == b"d":
+            return _F64.unpack_from(buffer, offset)[0], offset + 8
+        if tag == b"s":
+            return self.strings[_U32.unpack_from(buffer, offset)[0]], offset + 4
+        if tag == b"t":
+            return _datetime(_I64.unpack_from(buffer, offset)[0]), offset + 8
+        if tag == b"D":
+            microseconds = _I64.unpack_from(buffer, offset)[0]
+            return microseconds * _MICROSECOND, offset + 8
+        if tag == b"l":
+            (length,) = _U32.unpack_from(buffer, offset)
+            offset += 4
+            items = []
+            for _ in range(length):
+                item, offset = self.decode(offset)
+                items.append(item)
+            return items, offset
+        if tag == b"m":
+            (length,) = _U32.unpack_from(buffer, offset)
+            offset += 4
+            mapping = {}
+            for _ in range(length):
+                key, offset = self.decode(offset)
+                mapping[key], offset = self.decode(offset)
+            return mapping, offset
+        if tag == b"p":
+            (length,) = _U32.unpack_from(buffer, offset)
+            bounds = struct.unpack_from(f"<{2 * length}I", buffer, offset + 4)
+            ranges = PortRanges(zip(bounds[::2], bounds[1::2]))
+            return ranges, offset + 4 + 8 * length
+        if tag == b"e":
+            accept, offset = self.decode(offset)
+            reject, offset = self.decode(offset)
+            return ExitPolicy(accept, reject), offset
+        if tag == b"g":
+            fields = []
+            for _ in range(6):
+                item, offset = self.decode(offset)
+                fields.append(item)
+            first, last, interval, factor, count, values = fields
+            return GraphHistory(first, last, interval, factor, values, count), offset
+
+        raise ValueError(f"corrupt archive, unknown tag {tag!r}")
+
+
+class _Strings:
+    """
+    String table of an archive, each string decoded on first access.
+    """
+
+    def __init__(self, buffer, offset: int, count: int):
+        self._buffer = buffer
+        self._offsets = memoryview(buffer)[offset : offset + 8 * (count + 1)].cast("Q")
+        self._strings: List[Optional[str]] = [None] * count
+
+    def __getitem__(self, index: int) -> str:
+        if (string := self._strings[index]) is None:
+            start, end = self._offsets[index], self._offsets[index + 1]
+            string = self._strings[index] = str(self._buffer[start:end], "utf-8")
+        return string
+
+    def release(self) -> None:
+        self._offsets.release()
+
+
+def _fields(descriptor) -> Tuple[type, Tuple[str, ...]]:
+    """
+    Class a descriptor is materialised as, and the names of its fields.
+    """
+    if isinstance(descriptor, LazyRelayDetails):
+        # materialised eagerly, the JSON response is not archived.
+        descriptor = RelayDetails
+    cls = descriptor if isinstance(descriptor, type) else type(descriptor)
+    if dataclasses.is_dataclass(cls) and dataclasses.fields(cls):
+        return cls, tuple(field.name for field in dataclasses.fields(cls))
+    return cls, tuple(utils.attributes(descriptor))
+
+
+class ArchiveSection(Sequence):
+    """
+    Descriptors of the `relays` or `bridges` of an archived document. Each
+    descriptor is materialised on first access, and retained for subsequent
+    accesses.
+    """
+
+    def __init__(self, archive: "Archive", layout: dict):
+        self._archive = archive
+        self._count = layout["count"]
+        self._classes = [
+            (getattr(types, name), tuple(names)) for name, names in layout["classes"]
+        ]
+        self._columns = layout["columns"]
+        self._views: Dict[str, memoryview] = {}
+        self._descriptors: List[Any] = [None] * self._count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("archive section index out of range")
+        if (descriptor := self._descriptors[index]) is None:
+            descriptor = self._descriptors[index] = self._materialise(index)
+        return descriptor
+
+    def __add__(self, other: Iterable) -> list:
+        return list(self) + list(other)
+
+    def __radd__(self, other: Iterable) -> list:
+        return list(other) + list(self)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}<{self._count} descriptors>"
+
+    def _view(self, name: str) -> memoryview:
+        if (view := self._views.get(name)) is None:
+            layout = self._columns[name]
+            typecode = "Q" if layout["kind"] == "object" else _TYPECODES[layout["kind"]]
+            length = self._count + (layout["kind"] == "object")
+            size = array.array(typecode).itemsize * length
+            view = memoryview(self._archive._buffer)[
+                layout["offset"] : layout["offset"] + size
+            ].cast(typecode)
+            self._views[name] = view
+        return view
+
+    def column(self, name: str) -> memoryview:
+        """
+        Fixed-width column of field `name`, without copying. Pass it to
+        :func:`numpy.frombuffer` for an array. The archive cannot be closed
+        while views of its columns are held.
+
+        :param name: Field stored as integers, floating point numbers,
+            booleans or strings. Strings are indices into
+            :meth:`Archive.string`.
+        :raises KeyError: No field is named `name`.
+        :raises TypeError: The field is not stored in a fixed-width column.
+        """
+        if self._columns[name]["kind"] == "object":
+            raise TypeError(f"field {name} is not stored in a fixed-width column")
+        return self._view(name)
+
+    def value(self, name: str, index: int) -> Any:
+        """
+        Value of field `name` of a descriptor, without materialising it.
+
+        :param name: Field.
+        :param index: Position of the descriptor.
+        """
+        kind = self._columns[name]["kind"]
+        view = self._view(name)
+        if kind == "object":
+            values = self._columns[name]["offset"] + view.nbytes
+            return self._archive._decoder.decode(values + view[index])[0]
+
+        value = view[index]
+        if kind == "int":
+            return None if value == INT_NULL else value
+        if kind == "float":
+            return None if value != value else value
+        if kind == "bool":
+            return None if value < 0 else bool(value)
+        return None if value == STRING_NULL else self._archive.string(value)
+
+    def _materialise(self, index: int):
+        cls, names = self._classes[self._view("__class__")[index]]
+        return cls(**{name: self.value(name, index) for name in names})
+
+    def _release(self) -> None:
+        for view in self._views.values():
+            view.release()
+        self._views.clear()
+
+
+class Archive:
+    """
+    Document written by :meth:`write`, opened by memory-mapping the file.
+
+    Opening an archive only reads its header, descriptors are materialised
+    on demand from the mapped file, so reloading a document costs no JSON
+    decoding.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open the archive at `path`.
+
+        :param path: Path to an archive written by :meth:`write`.
+        :raises ValueError: The file is not an archive, or was written on a
+            machine of different byte order.
+        """
+        with open(path, "rb") as file:
+            self._buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, offset, length = _PREAMBLE.unpack_from(self._buffer)
+        if magic != MAGIC:
+            self._buffer.close()
+            raise ValueError(f"{path} is not an archive")
+        header = json.loads(self._buffer[offset : offset + length])
+        if header["byteorder"] != sys.byteorder:
+            self._buffer.close()
+            raise ValueError(
+                f"{path} was written on a {header['byteorder']}-endian machine"
+            )
+
+        self._strings = _Strings(self._buffer, *header["strings"])
+        self._decoder = _Decoder(self._buffer, self._strings)
+        self.relays = ArchiveSection(self, header["relays"])
+        self.bridges = ArchiveSection(self, header["bridges"])
+        self._metadata = self._decoder.decode(header["metadata"])[0]
+
+    def string(self, index: int) -> str:
+        """
+        String of the string table.
+
+        :param index: Index stored in a string column.
+        """
+        return self._strings[index]
+
+    def response(self) -> Response:
+        """
+        Archived document, whose `relays` and `bridges` are the
+        :class:`ArchiveSection` of the archive.
+        """
+        return Response(relays=self.relays, bridges=self.bridges, **self._metadata)
+
+    def close(self) -> None:
+        """
+        Unmap the archive. Descriptors already materialised remain usable.
+        """
+        self.relays._release()
+        self.bridges._release()
+        self._strings.release()
+        self._buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @staticmethod
+    def write(response: Response, path: str) -> None:
+        """
+        Write a document to an archive.
+
+        :param response: Document, whose descriptors may be of any type of
+            :data:`garlic.types.RelayDescriptor` and
+            :data:`garlic.types.BridgeDescriptor`.
+        :param path: Path to the archive. An existing archive is replaced
+            once the new archive is complete, archives opened from it remain
+            readable.
+        :raises TypeError: A field holds a value which cannot be archived.
+        """
+        # the archive is written beside `path` and renamed over it, so the
+        # file mapped by open archives is neither truncated nor rewritten.
+        file = tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp", delete=False
+        )
+        try:
+            with file:
+                Archive._write(response, file)
+                file.flush()
+                os.fsync(file.fileno())
+            if os.path.exists(path):
+                shutil.copymode(path, file.name)
+            os.replace(file.name, path)
+        except BaseException:
+            os.unlink(file.name)
+            raise
+
+    @staticmethod
+    def _write(response: Response, file) -> None:
+        """
+        Write a document to an archive, see :meth:`write`.
+
+        :param file: Empty binary file opened for reading and writing.
+        """
+        encoder = _Encoder()
+        header = {"byteorder": sys.byteorder}
+
+        file.write(_PREAMBLE.pack(MAGIC, 0, 0))
+
+        def align() -> int:
+            if padding := -file.tell() % 8:
+                file.write(bytes(padding))
+            return file.tell()
+
+        for section in ("relays", "bridges"):
+            descriptors = list(getattr(response, section))
+            classes: Dict[type, int] = {}
+            layouts = []
+            rows = []
+            for descriptor in descriptors:
+                cls, names = _fields(descriptor)
+                if cls not in classes:
+                    classes[cls] = len(layouts)
+                    layouts.append((cls.__name__, names))
+                rows.append(classes[cls])
+
+            columns = {"__class__": {"kind": "int", "offset": align()}}
+            file.write(array.array("q", rows).tobytes())
+
+            for name in dict.fromkeys(
+                name for _, names in layouts for name in names
+            ):
+                values = [
+                    getattr(descriptor, name, None) for descriptor in descriptors
+                ]
+                kind = _kind(values)
+                columns[name] = {"kind": kind, "offset": align()}
+                file.write(Archive._column(kind, values, encoder))
+
+            header[section] = {
+                "count": len(descriptors),
+                "classes": layouts,
+                "columns": columns,
+            }
+
+        metadata = {
+            field.name: getattr(response, field.name)
+            for field in dataclasses.fields(response)
+            if field.name not in ("relays", "bridges")
+        }
+        header["metadata"] = file.tell()
+        out = bytearray()
+        encoder.encode(metadata, out)
+        file.write(out)
+
+        # the string table is complete once every value is encoded.
+        strings = [string.encode() for string in encoder.strings]
+        offsets = array.array("Q", [0] * (len(strings) + 1))
+        offsets[0] = align() + offsets.itemsize * len(offsets)
+        for index, string in enumerate(strings):
+            offsets[index + 1] = offsets[index] + len(string)
+        header["strings"] = (file.tell(), len(strings))
+        file.write(offsets.tobytes())
+        file.writelines(strings)
+
+        encoded = json.dumps(header).encode()
+        offset = file.tell()
+        file.write(encoded)
+        file.seek(0)
+        file.write(_PREAMBLE.pack(MAGIC, offset, len(encoded)))
+
+    @staticmethod
+    def _column(kind: str, values: List[Any], encoder: _Encoder) -> bytes:
+        """
+        Column of `values`, as written to an archive.
+        """
+        if kind == "int":
+            return array.array(
+                "q", [INT_NULL if value is None else value for value in values]
+            ).tobytes()
+        if kind == "float":
+            return array.array(
+                "d", [float("nan") if value is None else value for value in values]
+            ).tobytes()
+        if kind == "bool":
+            return array.array(
+                "b", [-1 if value is None else value for value in values]
+            ).tobytes()
+        if kind == "str":
+            return array.array(
+                "I",
+                [
+                    STRING_NULL if value is None else encoder.string(value)
+                    for value in values
+                ],
+            ).tobytes()
+
+        # offsets are relative to the encoded values, following the offsets.
+        blob = bytearray()
+        offsets = array.array("Q")
+        for value in values:
+            offsets.append(len(blob))
+            encoder.encode(value, blob)
+        offsets.append(len(blob))
+        return offsets.tobytes() + blob
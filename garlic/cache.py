@@ -0,0 +1,692 @@
+"""
+Implementation of :class:`Cache` and its storage backends.
+
+.. currentmodule:: garlic.cache
+"""
+
+import contextlib
+import dataclasses
+import datetime as dt
+import hashlib
+import json
+import sqlite3
+import time
+import zlib
+
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Sequence, Set, Tuple
+
+import anyio
+
+from garlic.types import PartialRawResponse, Response
+
+#: Estimated size of a deserialised response relative to its JSON body.
+DOCUMENT_SIZE_FACTOR = 4
+
+
+@dataclasses.dataclass
+class CacheStatistics:
+    """
+    Counters describing the behaviour of a :class:`Cache`.
+
+    :param hits: Number of lookups served by a fresh entry.
+    :param misses: Number of lookups which were absent or expired.
+    :param revalidations: Number of expired entries revalidated by the API
+        without transferring the document again.
+    :param evictions: Number of entries evicted to honour the cache bounds.
+    :param expirations: Number of expired entries purged from the cache.
+    :param entries: Number of entries currently held.
+    :param size: Approximate size (bytes) of the entries currently held.
+    """
+
+    hits: int = 0
+    misses: int = 0
+    revalidations: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    entries: int = 0
+    size: int = 0
+
+
+@dataclasses.dataclass
+class CacheEntry:
+    """
+    Cached API response alongside its bookkeeping.
+
+    :param value: Cached API response.
+    :param expires: UTC timestamp when the entry must be revalidated.
+    :param last_modified: `Last-Modified` header of the response, used to
+        revalidate the entry once expired. :class:`python:None` if the API did
+        not provide one.
+    :param size: Approximate size (bytes) of the entry, including its
+        retained deserialised responses.
+    :param documents: Deserialised responses of `value`, keyed by the relay
+        and bridge descriptor types. Only retained by in-memory backends, see
+        :meth:`CacheBackend.retain`.
+    """
+
+    value: PartialRawResponse
+    expires: dt.datetime
+    last_modified: Optional[str] = None
+    size: int = 0
+    documents: Dict[tuple, Response] = dataclasses.field(
+        default_factory=dict, repr=False, compare=False
+    )
+
+    @property
+    def expired(self) -> bool:
+        """
+        Whether the entry must be revalidated before use.
+        """
+        return self.expires <= dt.datetime.utcnow()
+
+
+class CacheBackend(ABC):
+    """
+    Abstract storage interface for :class:`Cache` entries.
+
+    Backends are responsible for honouring their own bounds, evicting the
+    least recently used entries first.
+    """
+
+    @abstractmethod
+    async def get(self, key: tuple) -> Optional[CacheEntry]:
+        """
+        Retrieve the entry stored under `key`, marking it as recently used.
+
+        :param key: Key generated by :meth:`Cache.gen_key`.
+        """
+        ...
+
+    @abstractmethod
+    async def set(self, key: tuple, entry: CacheEntry) -> int:
+        """
+        Store `entry` under `key`, replacing any existing entry.
+
+        :param key: Key generated by :meth:`Cache.gen_key`.
+        :param entry: Entry to store.
+        :returns: Number of entries evicted to honour the bounds.
+        """
+        ...
+
+    async def retain(
+        self, key: tuple, entry: CacheEntry, types: tuple, document: Response
+    ) -> int:
+        """
+        Retain a deserialised response of the entry stored under `key`,
+        counting its estimated size towards the bounds. Backends which do not
+        hold entries in memory retain nothing.
+
+        :param key: Key generated by :meth:`Cache.gen_key`.
+        :param entry: Entry whose response was deserialised, nothing is
+            retained if it is no longer stored under `key`.
+        :param types: Relay and bridge descriptor types of `document`.
+        :param document: Deserialised response.
+        :returns: Number of entries evicted to honour the bounds.
+        """
+        return 0
+
+    async def expires(self, keys: Sequence[tuple]) -> Dict[tuple, dt.datetime]:
+        """
+        Retrieve the expiry of the entries stored under `keys`, without
+        retrieving the entries or marking them as recently used. Backends
+        should override this if :meth:`get` is costly.
+
+        :param keys: Keys generated by :meth:`Cache.gen_key`.
+        :returns: Expiry of each stored entry, keys without an entry are
+            omitted.
+        """
+        expiry = {}
+        for key in keys:
+            if (entry := await self.get(key)) is not None:
+                expiry[key] = entry.expires
+        return expiry
+
+    @abstractmethod
+    async def touch(self, key: tuple, expires: dt.datetime) -> None:
+        """
+        Update the expiry of the entry stored under `key`.
+
+        :param key: Key generated by :meth:`Cache.gen_key`.
+        :param expires: UTC timestamp when the entry must be revalidated.
+        """
+        ...
+
+    @abstractmethod
+    async def delete(self, key: tuple) -> None:
+        """
+        Remove the entry stored under `key`.
+
+        :param key: Key generated by :meth:`Cache.gen_key`.
+        """
+        ...
+
+    @abstractmethod
+    async def purge(self, deadline: dt.datetime) -> int:
+        """
+        Remove every entry which expired before `deadline`.
+
+        :param deadline: UTC timestamp.
+        :returns: Number of entries removed.
+        """
+        ...
+
+    @abstractmethod
+    async def clear(self) -> None:
+        """
+        Remove every entry.
+        """
+        ...
+
+    @abstractmethod
+    def usage(self) -> Tuple[int, int]:
+        """
+        Current occupancy of the backend, read whenever the statistics of the
+        cache are read. Called on the event loop, so it must not block.
+
+        :returns: Number of entries and their approximate size (bytes).
+        """
+        ...
+
+
+class MemoryBackend(CacheBackend):
+    """
+    In-process :class:`CacheBackend` holding entries in least-recently-used
+    order.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, max_size: Optional[int] = None):
+        """
+        :param max_entries: Maximum number of entries to hold.
+            :class:`python:None` if unbounded.
+        :param max_size: Maximum approximate size (bytes) of all entries,
+            including their retained deserialised responses.
+            :class:`python:None` if unbounded.
+        """
+        self._max_entries = max_entries
+        self._max_size = max_size
+        self._entries: "OrderedDict[tuple, CacheEntry]" = OrderedDict()
+        # keys in order of expiry, every entry shares the same lifetime.
+        self._expiry: "OrderedDict[tuple, None]" = OrderedDict()
+        self._size = 0
+
+    async def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    async def set(self, key, entry):
+        self._remove(key)
+        self._entries[key] = entry
+        self._expiry[key] = None
+        self._size += entry.size
+        return self._evict()
+
+    async def retain(self, key, entry, types, document):
+        if self._entries.get(key) is not entry or types in entry.documents:
+            return 0
+
+        # each retained document adds a multiple of the size of the response.
+        size = entry.size // (1 + DOCUMENT_SIZE_FACTOR * len(entry.documents))
+        entry.documents[types] = document
+        entry.size += DOCUMENT_SIZE_FACTOR * size
+        self._size += DOCUMENT_SIZE_FACTOR * size
+        self._entries.move_to_end(key)
+        return self._evict()
+
+    async def expires(self, keys):
+        return {
+            key: entry.expires
+            for key in keys
+            if (entry := self._entries.get(key)) is not None
+        }
+
+    def _evict(self) -> int:
+        evicted = 0
+        # the most recently used entry is never evicted.
+        while len(self._entries) > 1 and (
+            (self._max_entries is not None and len(self._entries) > self._max_entries)
+            or (self._max_size is not None and self._size > self._max_size)
+        ):
+            self._remove(next(iter(self._entries)))
+            evicted += 1
+        return evicted
+
+    async def touch(self, key, expires):
+        if (entry := self._entries.get(key)) is not None:
+            entry.expires = expires
+            self._expiry.move_to_end(key)
+
+    async def delete(self, key):
+        self._remove(key)
+
+    async def purge(self, deadline):
+        purged = 0
+        while self._expiry:
+            key = next(iter(self._expiry))
+            if self._entries[key].expires > deadline:
+                break
+            self._remove(key)
+            purged += 1
+        return purged
+
+    async def clear(self):
+        self._entries.clear()
+        self._expiry.clear()
+        self._size = 0
+
+    def usage(self):
+        return len(self._entries), self._size
+
+    def _remove(self, key) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._expiry.pop(key, None)
+            self._size -= entry.size
+
+
+class DiskBackend(CacheBackend):
+    """
+    :class:`CacheBackend` persisting compressed entries to an SQLite
+    database, allowing several processes to share one cache.
+
+    The database runs in write-ahead-logging mode and every operation is a
+    single transaction executed in a worker thread. Lookups read in a deferred
+    transaction, so they neither take nor wait for the write lock. The access
+    times used to evict the least recently used entries are recorded in
+    memory, and written with the next write or every `access_interval`
+    seconds. The occupancy reported by :meth:`usage` is read by each write,
+    so it includes the entries written by other processes until then.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: Optional[int] = None,
+        max_size: Optional[int] = None,
+        timeout: float = 30.0,
+        access_interval: float = 60.0,
+    ):
+        """
+        :param path: Path to the database, created if absent.
+        :param max_entries: Maximum number of entries to hold.
+            :class:`python:None` if unbounded.
+        :param max_size: Maximum approximate size (bytes) of all entries.
+            :class:`python:None` if unbounded.
+        :param timeout: Duration (seconds) to wait for a lock held by another
+            process.
+        :param access_interval: Maximum duration (seconds) access times
+            recorded by lookups are held in memory before being written.
+        """
+        self._path = path
+        self._max_entries = max_entries
+        self._max_size = max_size
+        self._timeout = timeout
+        self._access_interval = access_interval
+        # access times of entries read since the last write, by digest.
+        self._accessed: Dict[str, float] = {}
+        self._written = time.monotonic()
+
+        with contextlib.closing(self._connect()) as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, "
+                "value BLOB NOT NULL, "
+                "expires REAL NOT NULL, "
+                "last_modified TEXT, "
+                "size INTEGER NOT NULL, "
+                "accessed REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS entries_expires ON entries (expires)")
+            db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+            self._usage = self._count(db)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self._path, timeout=self._timeout, isolation_level=None)
+
+    def _transaction(self, write: bool, f, *args):
+        db = self._connect()
+        try:
+            db.execute("BEGIN IMMEDIATE" if write else "BEGIN DEFERRED")
+            try:
+                retn = f(db, *args)
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+            return retn
+        finally:
+            db.close()
+
+    @staticmethod
+    def _digest(key: tuple) -> str:
+        return hashlib.sha256(repr(key).encode()).hexdigest()
+
+    @staticmethod
+    def _timestamp(timestamp: dt.datetime) -> float:
+        return timestamp.replace(tzinfo=dt.timezone.utc).timestamp()
+
+    @staticmethod
+    def _datetime(timestamp: float) -> dt.datetime:
+        return dt.datetime.fromtimestamp(timestamp, dt.timezone.utc).replace(tzinfo=None)
+
+    @staticmethod
+    def _now() -> float:
+        return dt.datetime.now(dt.timezone.utc).timestamp()
+
+    async def _write(self, f, *args):
+        """
+        Execute `f` in a write transaction, after writing the access times
+        recorded since the last write.
+        """
+        accessed, self._accessed = self._accessed, {}
+        self._written = time.monotonic()
+        retn, self._usage = await anyio.run_in_thread(
+            self._transaction, True, self._record_accesses, accessed, f, args
+        )
+        return retn
+
+    @staticmethod
+    def _record_accesses(db, accessed, f, args):
+        db.executemany(
+            "UPDATE entries SET accessed = ? WHERE key = ?",
+            [(timestamp, digest) for digest, timestamp in accessed.items()],
+        )
+        return f(db, *args), DiskBackend._count(db)
+
+    @staticmethod
+    def _count(db) -> Tuple[int, int]:
+        return db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+
+    async def get(self, key):
+        digest = self._digest(key)
+        row = await anyio.run_in_thread(
+            self._transaction,
+            False,
+            lambda db: db.execute(
+                "SELECT value, expires, last_modified, size FROM entries "
+                "WHERE key = ?",
+                (digest,),
+            ).fetchone(),
+        )
+        if row is None:
+            return None
+
+        self._accessed[digest] = self._now()
+        if time.monotonic() - self._written >= self._access_interval:
+            await self._write(lambda db: None)
+
+        value, expires, last_modified, size = row
+        value = PartialRawResponse(**json.loads(zlib.decompress(value)))
+        return CacheEntry(value, self._datetime(expires), last_modified, size)
+
+    async def expires(self, keys):
+        digests = {self._digest(key): key for key in keys}
+        rows = await anyio.run_in_thread(
+            self._transaction, False, self._expires, list(digests)
+        )
+        return {digests[digest]: self._datetime(expires) for digest, expires in rows}
+
+    @staticmethod
+    def _expires(db, digests):
+        rows = []
+        # bounded by the number of variables SQLite accepts in a statement.
+        for start in range(0, len(digests), 500):
+            chunk = digests[start : start + 500]
+            rows += db.execute(
+                "SELECT key, expires FROM entries WHERE key IN ({})".format(
+                    ", ".join("?" * len(chunk))
+                ),
+                chunk,
+            ).fetchall()
+        return rows
+
+    async def set(self, key, entry):
+        value = zlib.compress(json.dumps(dataclasses.asdict(entry.value)).encode())
+        row = (
+            self._digest(key),
+            value,
+            self._timestamp(entry.expires),
+            entry.last_modified,
+            entry.size,
+            self._now(),
+        )
+        return await self._write(self._set, row)
+
+    def _set(self, db, row):
+        db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)", row)
+
+        evicted = 0
+        # the most recently inserted entry is never evicted.
+        if self._max_entries is not None:
+            evicted += db.execute(
+                "DELETE FROM entries WHERE key IN ("
+                "SELECT key FROM entries ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (max(self._max_entries, 1),),
+            ).rowcount
+        if self._max_size is not None:
+            evicted += db.execute(
+                "DELETE FROM entries WHERE key IN ("
+                "SELECT key FROM ("
+                "SELECT key, "
+                "SUM(size) OVER (ORDER BY accessed DESC, key) AS total, "
+                "ROW_NUMBER() OVER (ORDER BY accessed DESC, key) AS position "
+                "FROM entries) WHERE total > ? AND position > 1)",
+                (self._max_size,),
+            ).rowcount
+        return evicted
+
+    async def touch(self, key, expires):
+        await self._write(
+            lambda db: db.execute(
+                "UPDATE entries SET expires = ? WHERE key = ?",
+                (self._timestamp(expires), self._digest(key)),
+            ),
+        )
+
+    async def delete(self, key):
+        await self._write(
+            lambda db: db.execute(
+                "DELETE FROM entries WHERE key = ?", (self._digest(key),)
+            ),
+        )
+
+    async def purge(self, deadline):
+        return await self._write(
+            lambda db: db.execute(
+                "DELETE FROM entries WHERE expires <= ?", (self._timestamp(deadline),)
+            ).rowcount,
+        )
+
+    async def clear(self):
+        await self._write(lambda db: db.execute("DELETE FROM entries"))
+
+    def usage(self):
+        # read by the last write, the database is not read on the event loop.
+        return self._usage
+
+
+class Cache:
+    """
+    Cache of API responses stored in a :class:`CacheBackend`.
+
+    Entries are fresh for `ttl` seconds after being stored or revalidated.
+    Expired entries are retained for a further `stale_ttl` seconds so they can
+    be revalidated with a conditional request, after which they are purged
+    when the cache is updated, at most once every `ttl` seconds unless entries
+    were evicted to honour the bounds.
+    """
+
+    def __init__(
+        self,
+        enable_cache: bool = True,
+        ttl: int = 3600,
+        max_entries: Optional[int] = None,
+        max_size: Optional[int] = None,
+        stale_ttl: Optional[int] = None,
+        backend: Optional[CacheBackend] = None,
+    ):
+        """
+        :param enable_cache: Enable caching.
+        :param ttl: Lifetime of each cache entry (seconds).
+        :param max_entries: Maximum number of entries held by the default
+            :class:`MemoryBackend`. :class:`python:None` if unbounded.
+        :param max_size: Maximum approximate size (bytes) of all entries held
+            by the default :class:`MemoryBackend`. :class:`python:None` if
+            unbounded.
+        :param stale_ttl: Duration (seconds) expired entries are retained for
+            revalidation. Defaults to `ttl`.
+        :param backend: Storage backend. Defaults to a :class:`MemoryBackend`
+            bounded by `max_entries` and `max_size`.
+        """
+        if stale_ttl is None:
+            stale_ttl = ttl
+
+        if backend is None:
+            backend = MemoryBackend(max_entries, max_size)
+
+        self.enable_cache = enable_cache
+        self._ttl = dt.timedelta(seconds=ttl)
+        self._stale_ttl = dt.timedelta(seconds=stale_ttl)
+        self._backend = backend
+        self._statistics = CacheStatistics()
+        self._purged = time.monotonic()
+
+    @property
+    def statistics(self) -> CacheStatistics:
+        """
+        Counters of the cache, whose occupancy is read from the backend.
+        """
+        self._statistics.entries, self._statistics.size = self._backend.usage()
+        return self._statistics
+
+    async def lookup(self, key) -> Optional[CacheEntry]:
+        """
+        Lookup entry, fresh or expired, associated with `key`.
+
+        :param key: Key generated by :meth:`gen_key`.
+        :returns: Cache entry. :class:`python:None` if absent or expired
+            without the means to revalidate it.
+        """
+        if not self.enable_cache:
+            return None
+
+        entry = await self._backend.get(key)
+        if entry is None:
+            self._statistics.misses += 1
+            return None
+
+        if not entry.expired:
+            self._statistics.hits += 1
+            return entry
+
+        self._statistics.misses += 1
+        if entry.last_modified is None:
+            await self._backend.delete(key)
+            return None
+        return entry
+
+    async def fresh(self, keys: Iterable) -> Set[tuple]:
+        """
+        Keys under which a fresh entry is stored, reading only the expiry of
+        the entries and without affecting the statistics.
+
+        :param keys: Keys generated by :meth:`gen_key`.
+        :returns: Subset of `keys`.
+        """
+        if not self.enable_cache:
+            return set()
+
+        now = dt.datetime.utcnow()
+        expiry = await self._backend.expires(list(dict.fromkeys(keys)))
+        return {key for key, expires in expiry.items() if expires > now}
+
+    async def update(
+        self, key, value, size: int = 0, last_modified: Optional[str] = None
+    ) -> CacheEntry:
+        """
+        Store `value` under `key`, replacing any existing entry.
+
+        :param key: Key generated by :meth:`gen_key`.
+        :param value: API response.
+        :param size: Approximate size (bytes) of `value`.
+        :param last_modified: `Last-Modified` header of the response.
+        :returns: Entry holding `value`, which is not stored if caching is
+            disabled.
+        """
+        entry = CacheEntry(value, dt.datetime.utcnow() + self._ttl, last_modified, size)
+        if not self.enable_cache:
+            return entry
+
+        evicted = await self._backend.set(key, entry)
+        self._statistics.evictions += evicted
+        if evicted or time.monotonic() - self._purged >= self._ttl.total_seconds():
+            await self.purge()
+        return entry
+
+    async def retain(
+        self, key, entry: CacheEntry, types: tuple, document: Response
+    ) -> None:
+        """
+        Retain a deserialised response alongside the entry stored under `key`,
+        counted towards the bounds as :data:`DOCUMENT_SIZE_FACTOR` times the
+        size of the response.
+
+        :param key: Key generated by :meth:`gen_key`.
+        :param entry: Entry whose response was deserialised.
+        :param types: Relay and bridge descriptor types of `document`.
+        :param document: Deserialised response.
+        """
+        if not self.enable_cache:
+            return
+
+        self._statistics.evictions += await self._backend.retain(
+            key, entry, types, document
+        )
+
+    async def refresh(self, key) -> None:
+        """
+        Restart the lifetime of the entry stored under `key` after the API
+        confirmed it had not changed.
+
+        :param key: Key generated by :meth:`gen_key`.
+        """
+        await self._backend.touch(key, dt.datetime.utcnow() + self._ttl)
+        self._statistics.revalidations += 1
+
+    async def purge(self) -> int:
+        """
+        Remove every entry which can no longer be revalidated.
+
+        :returns: Number of entries removed.
+        """
+        purged = await self._backend.purge(dt.datetime.utcnow() - self._stale_ttl)
+        self._statistics.expirations += purged
+        self._purged = time.monotonic()
+        return purged
+
+    async def clear(self) -> None:
+        """
+        Remove every entry.
+        """
+        await self._backend.clear()
+
+    def gen_key(self, *args, **kwargs):
+        cache_key = [*args]
+
+        def tuplise(mapping):
+            items = []
+            for key, value in mapping.items():
+                if isinstance(value, dict):
+                    items.append((key, tuple(tuplise(value))))
+                else:
+                    items.append((key, value))
+            return items
+
+        cache_key.extend(tuplise(kwargs))
+        return tuple(cache_key)
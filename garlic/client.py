@@ -4,21 +4,46 @@ Implementation of :class:`Client`.
 .. currentmodule:: garlic.client
 """
 
+import codecs
+import contextlib
 import dataclasses
 import datetime as dt
 import functools
 import inspect
+import json
+import math
+import time
+import zlib
 
 from enum import Enum
-from typing import Set, NewType, Union
+from urllib.parse import urlsplit
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Set,
+    NewType,
+    Optional,
+    Union,
+)
 
+import anyio
 import asks
 
 from garlic import utils
+from garlic.cache import Cache, CacheBackend, CacheEntry, CacheStatistics
+from garlic.ratelimit import RateLimit, RateLimiter, RateLimitStatistics
+from garlic.retry import CircuitBreaker, RetryPolicy
+from garlic.stream import DocumentDecoder
 from garlic.types import (
     Deserialisable,
     Response,
     PartialRawResponse,
+    RelayDescriptor,
+    BridgeDescriptor,
     RelayBandwidth,
     BridgeBandwidth,
     BridgeSummary,
@@ -29,6 +54,7 @@ from garlic.types import (
     RelayUptime,
     BridgeDetails,
     RelayDetails,
+    LazyRelayDetails,
     PartialBridgeDetails,
     PartialRelayDetails,
 )
@@ -38,13 +64,15 @@ from garlic.exc import (
     BadRequest,
     InternalServerError,
     ServiceUnavailable,
+    ConsensusChanged,
+    CircuitOpen,
 )
 
 
 @dataclasses.dataclass
 class ContentNotChanged:
     """
-    HTTP response for 403 occurence when If-Modified-Since header is set.
+    HTTP response for 304 occurence when If-Modified-Since header is set.
 
     :param response: HTTP response.
     """
@@ -55,6 +83,19 @@ class ContentNotChanged:
 APIResponse = Union[Response, PartialRawResponse, ContentNotChanged]
 
 
+@dataclasses.dataclass
+class _Flight:
+    """
+    Request in flight, whose outcome is shared with identical requests
+    issued while it is in flight.
+    """
+
+    done: anyio.abc.Event
+    completed: bool = False
+    result: Any = None
+    error: Optional[Exception] = None
+
+
 def deserialise_response(
     response: APIResponse,
     relay_obj: Deserialisable = None,
@@ -80,6 +121,37 @@ def deserialise_response(
     return Response(**internal)
 
 
+def sanitise_parameters(params: dict) -> dict:
+    """
+    Convert parameters of direct API functions into their query string
+    representation, in place.
+
+    :param params: Parameters of a direct API function.
+    :returns: `params`.
+    """
+    if "order" in params:
+        params["order"] = ",".join(params["order"])
+    if "fields" in params:
+        params["fields"] = ",".join(params["fields"])
+    if "flag" in params:
+        params["flag"] = params["flag"].value
+    return params
+
+
+def check_parameters(params: dict, restrict: Set[str]) -> None:
+    """
+    Reject parameters which the requested document does not accept.
+
+    :param params: Parameters of a direct API function.
+    :param restrict: Parameters which are not accepted.
+    :raises TypeError: A parameter is not accepted.
+    """
+    if restrict & params.keys():
+        raise TypeError(
+            f"the following arguments are not allowed: {', '.join(restrict)}"
+        )
+
+
 def onionoo_parameterised(restrict: Set[str] = None):
     """
     Handle generic passing of parameters to direct API functions.
@@ -90,20 +162,11 @@ def onionoo_parameterised(restrict: Set[str] = None):
     def sanitise(f):
         @functools.wraps(f)
         async def wraps(*args, **kwargs):
-            if restrict & kwargs.keys():
-                raise TypeError(
-                    f"the following arguments are not allowed: {', '.join(restrict)}"
-                )
-
-            if "order" in kwargs:
-                kwargs["order"] = ",".join(kwargs["order"])
-            elif "fields" in kwargs:
-                kwargs["fields"] = ",".join(kwargs["fields"])
-            elif "flag" in kwargs:
-                kwargs["flag"] = kwargs["flag"].value
-
-            return await f(*args, **kwargs)
+            check_parameters(kwargs, restrict)
+            return await f(*args, **sanitise_parameters(kwargs))
 
+        # consulted by :meth:`Client.stream`, which accepts the same parameters.
+        wraps.restrict = frozenset(restrict)
         return wraps
 
     return sanitise
@@ -131,61 +194,35 @@ class Endpoint(Enum):
     UPTIME = "/uptime"
 
 
-class Cache:
-    def __init__(
-        self, factory, enable_cache: bool = True, ttl: int = 3600, enable: bool = True
-    ):
-        self._factory = factory
-        self._nested_call = False
-        self.enable_cache = enable_cache
-        self._ttl = dt.timedelta(seconds=ttl)
-        self._cache = {}
-
-    async def lookup(self, *args, **kwargs):
-        if not self.enable_cache or self._nested_call:
-            return None
-
-        key = self.gen_key(*args, **kwargs)
-        entry, timestamp = self._cache.get(key, (None, None))
-
-        if entry is None:
-            return None
-
-        if timestamp + self._ttl < dt.datetime.utcnow():
-            entry = await self.check_entry_lifetime(key, args, kwargs, timestamp)
-        return entry
-
-    def update(self, key, value):
-        if not self.enable_cache:
-            return
-        self._cache[key] = (value, dt.datetime.utcnow() + self._ttl)
-
-    async def check_entry_lifetime(self, key, args, kwargs, timestamp):
-        value = await self._factory(
-            *args,
-            **kwargs,
-            headers={"If-Modified-Since": timestamp.strftime(utils.UTC_FORMAT)},
-        )
-        if isinstance(value, ContentNotChanged):
-            value = await self._factory(*args, **kwargs)
-
-        self.update(key, value)
-        return value
-
-    def gen_key(self, *args, **kwargs):
-        cache_key = [*args]
-
-        def tuplise(mapping):
-            items = []
-            for key, value in mapping.items():
-                if isinstance(value, dict):
-                    items.extend((key, tuple(tuplise(value))))
-                else:
-                    items.append((key, value))
-            return items
+#: Failures of a request to reach the API or receive its response, such as a
+#: refused or reset connection, which are retried.
+CONNECTION_ERRORS = (
+    asks.errors.AsksException,
+    OSError,
+    anyio.exceptions.ClosedResourceError,
+    anyio.exceptions.IncompleteRead,
+)
 
-        cache_key.extend(tuplise(kwargs))
-        return tuple(cache_key)
+#: Relay and bridge descriptor types of each document.
+DESCRIPTOR_TYPES = {
+    Endpoint.SUMMARY: (RelaySummary, BridgeSummary),
+    Endpoint.DETAILS: (RelayDetails, BridgeDetails),
+    Endpoint.BANDWIDTH: (RelayBandwidth, BridgeBandwidth),
+    Endpoint.WEIGHTS: (RelayWeight, None),
+    Endpoint.CLIENTS: (None, BridgeClients),
+    Endpoint.UPTIME: (RelayUptime, BridgeUptime),
+}
+
+#: Estimated cost of requesting each whole document, in multiples of the cost
+#: of requesting the document for a single relay or bridge.
+BULK_LOOKUP_COST = {
+    Endpoint.SUMMARY: 4,
+    Endpoint.DETAILS: 30,
+    Endpoint.BANDWIDTH: 50,
+    Endpoint.WEIGHTS: 50,
+    Endpoint.CLIENTS: 10,
+    Endpoint.UPTIME: 40,
+}
 
 
 class Client:
@@ -199,36 +236,154 @@ class Client:
         timeout: int = 60,
         enable_cache: bool = False,
         cache_ttl: int = 3600,
+        cache_stale_ttl: Optional[int] = None,
+        cache_max_entries: Optional[int] = None,
+        cache_max_size: Optional[int] = None,
+        cache_backend: Optional[CacheBackend] = None,
+        cache_documents: bool = False,
+        connections: int = 10,
+        keep_alive: bool = True,
+        retry_policy: Optional[RetryPolicy] = None,
+        coalesce_requests: bool = False,
+        rate_limits: Optional[Dict[Endpoint, RateLimit]] = None,
     ):
         """
         Instantiate object.
 
+        The client owns a persistent HTTP session whose connections are reused
+        between requests. Use the client as an asynchronous context manager,
+        or call :meth:`close`, to release the pooled connections.
+
         :param max_retries: Maximum number of requests to the API per resource
-            before bailing.
+            before bailing, ignored if `retry_policy` is given.
         :param timeout: Timeout for each request before issuing another
             request.
         :param enable_cache: Enable request caching.
         :param cache_ttl: Lifetime of each cache entry (seconds).
+        :param cache_stale_ttl: Duration (seconds) expired entries are
+            retained so they can be revalidated with a conditional request
+            rather than requested again. Defaults to `cache_ttl`.
+        :param cache_max_entries: Maximum number of cached responses, the
+            least recently used responses are evicted first.
+        :param cache_max_size: Maximum approximate size (bytes) of all cached
+            responses, the least recently used responses are evicted first.
+        :param cache_backend: Storage for cached responses, such as a
+            :class:`garlic.cache.DiskBackend` shared between processes.
+            Defaults to an in-memory backend bounded by `cache_max_entries`
+            and `cache_max_size`.
+        :param cache_documents: Retain deserialised :class:`Response` objects
+            alongside cached responses held in memory, so repeated lookups do
+            not deserialise the document again. Retained responses are shared
+            between callers and must not be modified, and count towards
+            `cache_max_size` as an estimated multiple of the size of the
+            response, see :data:`garlic.cache.DOCUMENT_SIZE_FACTOR`.
+        :param connections: Maximum number of concurrent connections to the
+            API.
+        :param keep_alive: Keep connections open for reuse by subsequent
+            requests.
+        :param retry_policy: Policy deciding when failed requests are retried.
+            Defaults to :class:`garlic.retry.RetryPolicy` with `max_retries`
+            attempts.
+        :param coalesce_requests: Share a single request and deserialisation
+            between identical document requests issued concurrently. Every
+            caller then receives the same :class:`Response`, which must not
+            be modified, for instance by :meth:`GraphHistory.denormalise`.
+            Disabled by default so each caller receives its own response.
+        :param rate_limits: Bounds on the rate and concurrency of the requests
+            to each endpoint, retries included. The bounds of
+            :attr:`Endpoint.BASE` apply to every request, in addition to the
+            bounds of its endpoint.
         """
-        self._max_retries = max_retries
+        if retry_policy is None:
+            retry_policy = RetryPolicy(max_attempts=max_retries)
+        self._retry_policy = retry_policy
+        self._breakers = {}
         self._timeout = timeout
-        self._cache = Cache(self._request, enable_cache, cache_ttl)
-        self._default_headers = {"Accept-Encoding": "gzip"}
+        self._cache = Cache(
+            enable_cache,
+            cache_ttl,
+            max_entries=cache_max_entries,
+            max_size=cache_max_size,
+            stale_ttl=cache_stale_ttl,
+            backend=cache_backend,
+        )
+        self._cache_documents = cache_documents
+        self._coalesce_requests = coalesce_requests
+        self._flights: Dict[tuple, _Flight] = {}
+        self._limiters = {
+            endpoint: RateLimiter(limit)
+            for endpoint, limit in (rate_limits or {}).items()
+        }
+        self._default_headers = {
+            "Accept-Encoding": "gzip",
+            "Connection": "keep-alive" if keep_alive else "close",
+        }
+        self._session = asks.Session(
+            headers=self._default_headers, connections=connections
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self) -> None:
+        """
+        Close all pooled connections held by the client.
+        """
+        await self._session.close()
+
+    @property
+    def cache_statistics(self) -> CacheStatistics:
+        """
+        Snapshot of the cache hit, miss and eviction counters.
+        """
+        return dataclasses.replace(self._cache.statistics)
+
+    @property
+    def rate_limit_statistics(self) -> Dict[Endpoint, RateLimitStatistics]:
+        """
+        Snapshot of the admission counters and queue wait time of the rate
+        limits of each endpoint.
+        """
+        return {
+            endpoint: dataclasses.replace(limiter.statistics)
+            for endpoint, limiter in self._limiters.items()
+        }
 
-    async def _request(
-        self, verb: str, url: str, *args, **kwargs
-    ) -> PartialRawResponse:
+    async def _exchange(self, verb: str, url: str, *args, **kwargs) -> CacheEntry:
         """
         Issue request to Onionoo API.
 
+        Cached responses are returned while fresh. Expired responses are
+        revalidated with a conditional request and returned as-is if the API
+        reports the document has not been modified.
+
         :param verb: HTTP verb.
         :param url: Destination URL.
+        :returns: Cache entry holding the API response, which is not stored
+            in the cache if caching is disabled or the response is
+            :class:`ContentNotChanged`.
         """
-        if (entry := await self._cache.lookup(verb, url, *args, **kwargs)) is not None:
-            return entry
+        headers = kwargs.pop("headers", {})
+        key = self._cache.gen_key(verb, url, *args, **kwargs)
+
+        # revalidation is only attempted for requests which are not already
+        # conditional, otherwise the caller expects :class:`ContentNotChanged`.
+        entry = None
+        if "If-Modified-Since" not in headers:
+            entry = await self._cache.lookup(key)
+            if entry is not None:
+                if not entry.expired:
+                    return entry
+                headers = {**headers, "If-Modified-Since": entry.last_modified}
+        if "If-Modified-Since" in headers:
+            # asks processes 304 as a redirect, failing on the absent
+            # `Location` header, unless redirects are not followed.
+            kwargs["follow_redirects"] = False
 
         http_handlers = {
-            200: lambda r: PartialRawResponse(**r.json()),
             304: ContentNotChanged,
             400: BadRequest,
             404: NotFound,
@@ -236,25 +391,648 @@ class Client:
             503: ServiceUnavailable,
         }
 
-        headers = kwargs.pop("headers", {})
-        headers.update(self._default_headers)
+        response = await self._send(verb, url, *args, headers=headers, **kwargs)
+        status_code = response.status_code
+        if status_code == 200:
+            body = response.text
+            return await self._cache.update(
+                key,
+                PartialRawResponse(**json.loads(body)),
+                size=len(body),
+                last_modified=response.headers.get("Last-Modified"),
+            )
+
+        if status_code == 304 and entry is not None:
+            await self._cache.refresh(key)
+            return entry
+
+        retn = http_handlers.get(status_code, HTTPError)(response)
+        if isinstance(retn, Exception):
+            raise retn
+        return CacheEntry(retn, dt.datetime.utcnow())
+
+    async def _send(
+        self,
+        verb: str,
+        url: str,
+        *args,
+        headers: dict,
+        stream: bool = False,
+        slots: Optional[contextlib.AsyncExitStack] = None,
+        **kwargs,
+    ) -> asks.response_objects.Response:
+        """
+        Issue request to Onionoo API, retrying according to the retry policy.
 
-        for retry in range(self._max_retries):
+        Timeouts, :data:`CONNECTION_ERRORS` and responses with a retryable
+        status are retried after a delay. Once the attempts or the deadline are
+        exhausted, the response to the last attempt is returned if one was
+        received.
+
+        :param verb: HTTP verb.
+        :param url: Destination URL.
+        :param headers: HTTP headers.
+        :param stream: Return the response before its body is received.
+        :param slots: Exit stack which takes over the concurrency slots of
+            the rate limits held by the returned response, rather than
+            releasing them once its headers are received.
+        :returns: HTTP response.
+        :raises CircuitOpen: Recent requests to the host failed repeatedly.
+        """
+        policy = self._retry_policy
+        host = urlsplit(url).netloc
+        if (breaker := self._breakers.get(host)) is None:
+            breaker = CircuitBreaker(policy.breaker_threshold, policy.breaker_cooldown)
+            self._breakers[host] = breaker
+
+        limiters = []
+        if self._limiters:
+            path = urlsplit(url).path
+            limiters = [
+                limiter
+                for endpoint, limiter in self._limiters.items()
+                if endpoint is not Endpoint.BASE and endpoint.value == path
+            ]
+            if Endpoint.BASE in self._limiters:
+                limiters.append(self._limiters[Endpoint.BASE])
+
+        # the breaker counts requests rather than attempts, so the retries of
+        # a single request do not open it.
+        if not breaker.allow():
+            raise CircuitOpen(f"requests to {host} are suspended")
+
+        started = time.monotonic()
+        for attempt in range(policy.max_attempts):
+            timeout = self._timeout
+            if policy.deadline is not None:
+                timeout = min(timeout, policy.deadline - (time.monotonic() - started))
+
+            response = retry_after = None
             try:
-                response = await asks.request(
-                    verb, url, *args, headers=headers, **kwargs, timeout=self._timeout,
+                async with contextlib.AsyncExitStack() as stack:
+                    # endpoint limits first, so waiting on them does not hold
+                    # a slot of the limits of every request.
+                    for limiter in limiters:
+                        await stack.enter_async_context(limiter)
+                    response = await self._session.request(
+                        verb,
+                        url,
+                        *args,
+                        headers=headers,
+                        **kwargs,
+                        stream=stream,
+                        timeout=timeout,
+                    )
+                    if (
+                        slots is not None
+                        and response.status_code not in policy.retry_statuses
+                    ):
+                        slots.push_async_exit(stack.pop_all())
+            except CONNECTION_ERRORS:
+                pass
+            else:
+                if response.status_code not in policy.retry_statuses:
+                    breaker.record_success()
+                    return response
+
+                retry_after = policy.parse_retry_after(
+                    response.headers.get("Retry-After")
+                )
+
+            if attempt + 1 == policy.max_attempts:
+                break
+            delay = policy.delay(attempt, retry_after)
+            if (
+                policy.deadline is not None
+                and time.monotonic() - started + delay >= policy.deadline
+            ):
+                break
+            if isinstance(
+                getattr(response, "body", None), asks.response_objects.StreamBody
+            ):
+                await response.body.close()
+            await anyio.sleep(delay)
+
+        breaker.record_failure()
+        if response is not None:
+            return response
+        raise HTTPError("maximum retries exceeded, bailing")
+
+    async def _get_document(
+        self,
+        endpoint: Endpoint,
+        params: dict,
+        relay_obj: Deserialisable = None,
+        bridge_obj: Deserialisable = None,
+    ) -> Union[Response, asks.response_objects.Response]:
+        """
+        Request document from API and deserialise it, reusing the response
+        previously deserialised from the same cache entry if permitted.
+
+        Identical requests issued while the document is being requested wait
+        for it rather than requesting it again, if coalescing is enabled.
+
+        :param endpoint: Document endpoint.
+        :param params: Query parameters.
+        :param relay_obj: Object to deserialise array of relay descriptors into.
+        :param bridge_obj: Object to deserialise array of bridge descriptors into.
+        """
+        url = "{0.value}{1.value}".format(Endpoint.BASE, endpoint)
+        if not self._coalesce_requests:
+            return await self._fetch_document(url, params, relay_obj, bridge_obj)
+
+        key = (self._cache.gen_key("GET", url, params=params), relay_obj, bridge_obj)
+        while (flight := self._flights.get(key)) is not None:
+            await flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            if flight.completed:
+                return flight.result
+            # the request was cancelled, it is issued again.
+
+        flight = self._flights[key] = _Flight(anyio.create_event())
+        try:
+            flight.result = await self._fetch_document(
+                url, params, relay_obj, bridge_obj
+            )
+            flight.completed = True
+            return flight.result
+        except Exception as exc:
+            flight.error = exc
+            raise
+        finally:
+            del self._flights[key]
+            async with anyio.open_cancel_scope(shield=True):
+                await flight.done.set()
+
+    async def _fetch_document(
+        self,
+        url: str,
+        params: dict,
+        relay_obj: Deserialisable = None,
+        bridge_obj: Deserialisable = None,
+    ) -> Union[Response, asks.response_objects.Response]:
+        """
+        Request document from API and deserialise it, see :meth:`_get_document`.
+        """
+        entry = await self._exchange("GET", url, params=params)
+        if not self._cache_documents or isinstance(entry.value, ContentNotChanged):
+            return deserialise_response(entry.value, relay_obj, bridge_obj)
+
+        if (document := entry.documents.get((relay_obj, bridge_obj))) is None:
+            document = deserialise_response(entry.value, relay_obj, bridge_obj)
+            await self._cache.retain(
+                self._cache.gen_key("GET", url, params=params),
+                entry,
+                (relay_obj, bridge_obj),
+                document,
+            )
+        return document
+
+    async def _paginate(
+        self,
+        method: Callable[..., Awaitable[Response]],
+        page_size: int,
+        task_group: Optional[anyio.abc.TaskGroup],
+        kwargs: dict,
+    ) -> AsyncIterator[Union[RelayDescriptor, BridgeDescriptor]]:
+        """
+        Iterate over the descriptors of a document, requesting `page_size`
+        descriptors at a time.
+
+        :param method: Bound `get_*` method requesting the document.
+        :param page_size: Number of descriptors requested per page.
+        :param task_group: Task group in which the following page is requested
+            while the current page is consumed. Pages are requested in turn if
+            :class:`python:None`.
+        :param kwargs: Parameters passed to `method`, `offset` and `limit`
+            bound the whole iteration.
+        """
+        if page_size < 1:
+            raise ValueError("page_size must be positive")
+
+        offset = kwargs.pop("offset", 0)
+        remaining = kwargs.pop("limit", None)
+
+        async def fetch(offset, remaining, results=None, event=None):
+            limit = page_size if remaining is None else min(page_size, remaining)
+            page = await method(**kwargs, offset=offset, limit=limit)
+            if event is None:
+                return page
+            results.append(page)
+            await event.set()
+
+        def following(page, offset, remaining):
+            consumed = len(page.relays) + len(page.bridges)
+            if remaining is not None:
+                remaining -= consumed
+            if (
+                not consumed
+                or remaining == 0
+                or not (page.relays_truncated or page.bridges_truncated)
+            ):
+                return None
+            return offset + consumed, remaining
+
+        cursor = (offset, remaining)
+        page = await fetch(*cursor)
+        while True:
+            cursor = following(page, *cursor)
+            if cursor is not None and task_group is not None:
+                # the task group is owned by the caller, so no cancel scope
+                # of the iterator spans a yield.
+                results, event = [], anyio.create_event()
+                await task_group.spawn(fetch, *cursor, results, event)
+
+            for descriptor in page.relays + page.bridges:
+                yield descriptor
+
+            if cursor is None:
+                return
+            if task_group is None:
+                page = await fetch(*cursor)
+            else:
+                await event.wait()
+                page = results.pop()
+
+    async def get_parallel(
+        self,
+        endpoint: Endpoint,
+        windows: int = 8,
+        max_concurrency: int = 4,
+        **kwargs,
+    ) -> Response:
+        """
+        Get document from API by requesting `windows` disjoint `offset` and
+        `limit` windows of it concurrently, then merging them into a single
+        response.
+
+        The number of descriptors is determined by first requesting the
+        document with a zero limit.
+
+        :param endpoint: Document endpoint, any except :attr:`Endpoint.BASE`.
+        :param windows: Number of windows to split the document into.
+        :param max_concurrency: Maximum number of windows requested at once.
+        :param kwargs: Parameters accepted by the `get_*` method of the
+            document, `offset` and `limit` bound the whole document.
+        :raises ConsensusChanged: The windows were not published together.
+        """
+        if endpoint is Endpoint.BASE:
+            raise ValueError("endpoint must be a document endpoint")
+        if windows < 1 or max_concurrency < 1:
+            raise ValueError("windows and max_concurrency must be positive")
+
+        method = getattr(self, "get_" + endpoint.name.lower())
+        offset = kwargs.pop("offset", 0)
+        limit = kwargs.pop("limit", None)
+
+        probe = await method(**kwargs, offset=offset, limit=0)
+        total = probe.relays_truncated + probe.bridges_truncated
+        if limit is not None:
+            total = min(total, limit)
+        if not total:
+            return probe
+
+        size = math.ceil(total / windows)
+        bounds = [(start, min(size, total - start)) for start in range(0, total, size)]
+        pages = [None] * len(bounds)
+        semaphore = anyio.create_semaphore(max_concurrency)
+
+        async def fetch(index, start, length):
+            async with semaphore:
+                pages[index] = await method(
+                    **kwargs, offset=offset + start, limit=length
                 )
-            except asks.errors.RequestTimeout:
-                continue
 
-            retn = http_handlers.get(response.status_code, HTTPError)(response)
-            if isinstance(retn, Exception):
-                raise retn
+        async with anyio.create_task_group() as tg:
+            for index, (start, length) in enumerate(bounds):
+                await tg.spawn(fetch, index, start, length)
+
+        for page in pages:
+            if (page.relays_published, page.bridges_published) != (
+                probe.relays_published,
+                probe.bridges_published,
+            ):
+                raise ConsensusChanged(
+                    "document changed between windows, published "
+                    f"{probe.relays_published} and {page.relays_published}"
+                )
 
-            self._cache.update(self._cache.gen_key(verb, url, *args, **kwargs), retn)
-            return retn
+        return dataclasses.replace(
+            pages[0],
+            relays=[relay for page in pages for relay in page.relays],
+            bridges=[bridge for page in pages for bridge in page.bridges],
+            relays_truncated=pages[-1].relays_truncated,
+            bridges_truncated=pages[-1].bridges_truncated,
+        )
 
-        raise HTTPError("maximum retries exceeded, bailing")
+    async def lookup_many(
+        self,
+        fingerprints: Iterable[str],
+        document: Endpoint = Endpoint.DETAILS,
+        max_concurrency: int = 8,
+        bulk_cost: Optional[int] = None,
+        **kwargs,
+    ) -> Dict[str, Union[RelayDescriptor, BridgeDescriptor]]:
+        """
+        Lookup the descriptors of many relays or bridges in one document.
+
+        Fingerprints whose lookup is cached are served from the cache. The
+        remainder are either looked up individually, `max_concurrency` at a
+        time, or extracted from the whole document, whichever is estimated
+        to be cheaper. The whole document is always used if it is cached.
+
+        :param fingerprints: Relay fingerprints or bridge hashed fingerprints.
+        :param document: Document endpoint, any except :attr:`Endpoint.BASE`.
+        :param max_concurrency: Maximum number of lookups requested at once.
+        :param bulk_cost: Estimated cost of requesting the whole document, in
+            multiples of the cost of a single lookup. Defaults to
+            :data:`BULK_LOOKUP_COST`.
+        :param kwargs: Parameters accepted by the `get_*` method of the
+            document.
+        :returns: Descriptors keyed by upper-case fingerprint, fingerprints
+            without a descriptor are omitted.
+        """
+        if document is Endpoint.BASE:
+            raise ValueError("document must be a document endpoint")
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be positive")
+
+        if bulk_cost is None:
+            bulk_cost = BULK_LOOKUP_COST[document]
+
+        method = getattr(self, "get_" + document.name.lower())
+        url = "{0.value}{1.value}".format(Endpoint.BASE, document)
+        wanted = list(
+            dict.fromkeys(fingerprint.upper() for fingerprint in fingerprints)
+        )
+
+        def cache_key(params):
+            params.pop("lazy", None)
+            return self._cache.gen_key("GET", url, params=sanitise_parameters(params))
+
+        # the whole document is requested with the fingerprints, whether or
+        # not `fields` restricts it.
+        bulk_kwargs = dict(kwargs)
+        if "fields" in bulk_kwargs:
+            bulk_kwargs["fields"] = tuple(
+                dict.fromkeys(
+                    (*bulk_kwargs["fields"], "fingerprint", "hashed_fingerprint")
+                )
+            )
+
+        keys = {
+            fingerprint: cache_key({**kwargs, "lookup": fingerprint})
+            for fingerprint in wanted
+        }
+        bulk_key = cache_key(dict(bulk_kwargs))
+        fresh = await self._cache.fresh([*keys.values(), bulk_key])
+        missing = [fp for fp in wanted if keys[fp] not in fresh]
+
+        if missing and (
+            bulk_key in fresh
+            or math.ceil(len(missing) / max_concurrency) > bulk_cost
+        ):
+            response = await method(**bulk_kwargs)
+            descriptors = {}
+            for relay in response.relays:
+                if fingerprint := getattr(relay, "fingerprint", None):
+                    descriptors.setdefault(fingerprint.upper(), relay)
+            for bridge in response.bridges:
+                # bridges of the history documents are keyed by `fingerprint`.
+                fingerprint = getattr(bridge, "hashed_fingerprint", None) or getattr(
+                    bridge, "fingerprint", None
+                )
+                if fingerprint:
+                    descriptors.setdefault(fingerprint.upper(), bridge)
+            if any(fp not in descriptors for fp in wanted):
+                # relays are looked up by their hashed fingerprint too.
+                for relay in response.relays:
+                    if fingerprint := getattr(relay, "fingerprint", None):
+                        hashed = utils.hash_fingerprint(fingerprint)
+                        descriptors.setdefault(hashed, relay)
+            return {fp: descriptors[fp] for fp in wanted if fp in descriptors}
+
+        results = {}
+        semaphore = anyio.create_semaphore(max_concurrency)
+
+        async def fetch(fingerprint):
+            async with semaphore:
+                response = await method(**kwargs, lookup=fingerprint)
+            if descriptors := response.relays + response.bridges:
+                results[fingerprint] = descriptors[0]
+
+        async with anyio.create_task_group() as tg:
+            for fingerprint in wanted:
+                await tg.spawn(fetch, fingerprint)
+        return {fp: results[fp] for fp in wanted if fp in results}
+
+    def iter_summary(
+        self,
+        page_size: int = 1000,
+        task_group: Optional[anyio.abc.TaskGroup] = None,
+        **kwargs,
+    ) -> AsyncIterator[Union[RelaySummary, BridgeSummary]]:
+        """
+        Iterate over the descriptors of the summary document, relays first,
+        requesting `page_size` descriptors at a time.
+
+        :param page_size: Number of descriptors requested per page.
+        :param task_group: Task group in which the following page is requested
+            while the current page is consumed. A request pending when the
+            iteration is exited early completes, or is cancelled, with the
+            task group. Pages are requested in turn if :class:`python:None`.
+        :param kwargs: Parameters accepted by :meth:`get_summary`, `offset`
+            and `limit` bound the whole iteration.
+        """
+        return self._paginate(self.get_summary, page_size, task_group, kwargs)
+
+    def iter_details(
+        self,
+        page_size: int = 1000,
+        task_group: Optional[anyio.abc.TaskGroup] = None,
+        **kwargs,
+    ) -> AsyncIterator[Union[RelayDescriptor, BridgeDescriptor]]:
+        """
+        Iterate over the descriptors of the details document, relays first,
+        requesting `page_size` descriptors at a time.
+
+        :param page_size: Number of descriptors requested per page.
+        :param task_group: Task group in which the following page is requested
+            while the current page is consumed. A request pending when the
+            iteration is exited early completes, or is cancelled, with the
+            task group. Pages are requested in turn if :class:`python:None`.
+        :param kwargs: Parameters accepted by :meth:`get_details`, `offset`
+            and `limit` bound the whole iteration.
+        """
+        return self._paginate(self.get_details, page_size, task_group, kwargs)
+
+    def iter_bandwidth(
+        self,
+        page_size: int = 1000,
+        task_group: Optional[anyio.abc.TaskGroup] = None,
+        **kwargs,
+    ) -> AsyncIterator[Union[RelayBandwidth, BridgeBandwidth]]:
+        """
+        Iterate over the descriptors of the bandwidth document, relays first,
+        requesting `page_size` descriptors at a time.
+
+        :param page_size: Number of descriptors requested per page.
+        :param task_group: Task group in which the following page is requested
+            while the current page is consumed. A request pending when the
+            iteration is exited early completes, or is cancelled, with the
+            task group. Pages are requested in turn if :class:`python:None`.
+        :param kwargs: Parameters accepted by :meth:`get_bandwidth`, `offset`
+            and `limit` bound the whole iteration.
+        """
+        return self._paginate(self.get_bandwidth, page_size, task_group, kwargs)
+
+    def iter_weights(
+        self,
+        page_size: int = 1000,
+        task_group: Optional[anyio.abc.TaskGroup] = None,
+        **kwargs,
+    ) -> AsyncIterator[RelayWeight]:
+        """
+        Iterate over the descriptors of the weights document, requesting
+        `page_size` descriptors at a time.
+
+        :param page_size: Number of descriptors requested per page.
+        :param task_group: Task group in which the following page is requested
+            while the current page is consumed. A request pending when the
+            iteration is exited early completes, or is cancelled, with the
+            task group. Pages are requested in turn if :class:`python:None`.
+        :param kwargs: Parameters accepted by :meth:`get_weights`, `offset`
+            and `limit` bound the whole iteration.
+        """
+        return self._paginate(self.get_weights, page_size, task_group, kwargs)
+
+    def iter_clients(
+        self,
+        page_size: int = 1000,
+        task_group: Optional[anyio.abc.TaskGroup] = None,
+        **kwargs,
+    ) -> AsyncIterator[BridgeClients]:
+        """
+        Iterate over the descriptors of the clients document, requesting
+        `page_size` descriptors at a time.
+
+        :param page_size: Number of descriptors requested per page.
+        :param task_group: Task group in which the following page is requested
+            while the current page is consumed. A request pending when the
+            iteration is exited early completes, or is cancelled, with the
+            task group. Pages are requested in turn if :class:`python:None`.
+        :param kwargs: Parameters accepted by :meth:`get_clients`, `offset`
+            and `limit` bound the whole iteration.
+        """
+        return self._paginate(self.get_clients, page_size, task_group, kwargs)
+
+    def iter_uptime(
+        self,
+        page_size: int = 1000,
+        task_group: Optional[anyio.abc.TaskGroup] = None,
+        **kwargs,
+    ) -> AsyncIterator[Union[RelayUptime, BridgeUptime]]:
+        """
+        Iterate over the descriptors of the uptime document, relays first,
+        requesting `page_size` descriptors at a time.
+
+        :param page_size: Number of descriptors requested per page.
+        :param task_group: Task group in which the following page is requested
+            while the current page is consumed. A request pending when the
+            iteration is exited early completes, or is cancelled, with the
+            task group. Pages are requested in turn if :class:`python:None`.
+        :param kwargs: Parameters accepted by :meth:`get_uptime`, `offset`
+            and `limit` bound the whole iteration.
+        """
+        return self._paginate(self.get_uptime, page_size, task_group, kwargs)
+
+    async def stream(
+        self, endpoint: Endpoint, **kwargs
+    ) -> AsyncIterator[Union[RelayDescriptor, BridgeDescriptor]]:
+        """
+        Iterate over the descriptors of a document, relays first, while it is
+        being received.
+
+        Each descriptor is decoded and deserialised as soon as it has been
+        received, so only the descriptor being processed is held in memory
+        rather than the whole document. Streamed documents bypass the cache.
+        The concurrency slots of the rate limits are held until the document
+        has been received or the iterator is closed.
+
+        :param endpoint: Document endpoint, any except :attr:`Endpoint.BASE`.
+        :param kwargs: Parameters accepted by the `get_*` method of the
+            document.
+        :raises ValueError: The document was truncated, or both `lazy` and
+            `fields` were given.
+        :raises TypeError: A parameter is not accepted by the document.
+        """
+        if endpoint is Endpoint.BASE:
+            raise ValueError("endpoint must be a document endpoint")
+        method = getattr(self, "get_" + endpoint.name.lower())
+        check_parameters(kwargs, method.restrict)
+
+        relay_obj, bridge_obj = DESCRIPTOR_TYPES[endpoint]
+        lazy = endpoint is Endpoint.DETAILS and kwargs.pop("lazy", False)
+        if lazy and "fields" in kwargs:
+            raise ValueError("lazy cannot be combined with fields")
+        if endpoint is Endpoint.DETAILS and "fields" in kwargs:
+            relay_obj, bridge_obj = PartialRelayDetails, PartialBridgeDetails
+        if lazy:
+            relay_obj = LazyRelayDetails
+
+        url = "{0.value}{1.value}".format(Endpoint.BASE, endpoint)
+        # the concurrency slots of the rate limits are held until the body
+        # has been received.
+        async with contextlib.AsyncExitStack() as slots:
+            response = await self._send(
+                "GET",
+                url,
+                headers={},
+                params=sanitise_parameters(kwargs),
+                stream=True,
+                slots=slots,
+            )
+
+            if response.status_code != 200:
+                # asks only streams bodies which are not empty.
+                if isinstance(response.body, asks.response_objects.StreamBody):
+                    await response.body.close()
+                http_handlers = {
+                    400: BadRequest,
+                    404: NotFound,
+                    500: InternalServerError,
+                    503: ServiceUnavailable,
+                }
+                raise http_handlers.get(response.status_code, HTTPError)(response)
+
+            async with response.body:
+                # the body is decompressed here rather than by asks, accepting
+                # either gzip or zlib framing.
+                response.body.decompress_data = False
+                decompressor = None
+                if response.headers.get("Content-Encoding") in ("gzip", "deflate"):
+                    decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 32)
+
+                decoder = DocumentDecoder()
+                text = codecs.getincrementaldecoder("utf-8")()
+
+                def decoded(chunk, final=False):
+                    for array, element in decoder.feed(text.decode(chunk, final=final)):
+                        obj = relay_obj if array == "relays" else bridge_obj
+                        yield obj.from_json(element) if obj else element
+
+                async for chunk in response.body:
+                    if decompressor is not None:
+                        chunk = decompressor.decompress(chunk)
+                    for descriptor in decoded(chunk):
+                        yield descriptor
+
+                # the last descriptor may only be completed by flushing.
+                tail = decompressor.flush() if decompressor is not None else b""
+                for descriptor in decoded(tail, final=True):
+                    yield descriptor
+                decoder.close()
 
     @onionoo_parameterised(
         restrict={"fields",}
@@ -337,10 +1115,8 @@ class Client:
         :param int limit: Limit result to the given number of relays and/or
             bridges.
         """
-        url = "{0.value}{1.value}".format(Endpoint.BASE, Endpoint.SUMMARY)
-        response = await self._request("GET", url, params=kwargs)
-        return deserialise_response(
-            response, relay_obj=RelaySummary, bridge_obj=BridgeSummary
+        return await self._get_document(
+            Endpoint.SUMMARY, kwargs, relay_obj=RelaySummary, bridge_obj=BridgeSummary
         )
 
     @onionoo_parameterised()
@@ -424,19 +1200,25 @@ class Client:
             Relays are skipped first, then bridges.
         :param int limit: Limit result to the given number of relays and/or
             bridges.
+        :param bool lazy: Deserialise relays into :class:`LazyRelayDetails`,
+            which decode each field on first access. Cannot be combined with
+            `fields`, whose relays are :class:`PartialRelayDetails`.
+        :raises ValueError: Both `lazy` and `fields` were given.
         """
-        url = "{0.value}{1.value}".format(Endpoint.BASE, Endpoint.DETAILS)
-        response = await self._request("GET", url, params=kwargs)
-
         relay_obj = RelayDetails
         bridge_obj = BridgeDetails
 
+        lazy = kwargs.pop("lazy", False)
+        if lazy and "fields" in kwargs:
+            raise ValueError("lazy cannot be combined with fields")
         if "fields" in kwargs:
             relay_obj = PartialRelayDetails
             bridge_obj = PartialBridgeDetails
+        if lazy:
+            relay_obj = LazyRelayDetails
 
-        return deserialise_response(
-            response, relay_obj=relay_obj, bridge_obj=bridge_obj
+        return await self._get_document(
+            Endpoint.DETAILS, kwargs, relay_obj=relay_obj, bridge_obj=bridge_obj
         )
 
     @onionoo_parameterised(
@@ -520,10 +1302,11 @@ class Client:
         :param int limit: Limit result to the given number of relays and/or
             bridges.
         """
-        url = "{0.value}{1.value}".format(Endpoint.BASE, Endpoint.BANDWIDTH)
-        response = await self._request("GET", url, params=kwargs)
-        return deserialise_response(
-            response, relay_obj=RelayBandwidth, bridge_obj=BridgeBandwidth
+        return await self._get_document(
+            Endpoint.BANDWIDTH,
+            kwargs,
+            relay_obj=RelayBandwidth,
+            bridge_obj=BridgeBandwidth,
         )
 
     @onionoo_parameterised(
@@ -607,10 +1390,9 @@ class Client:
         :param int limit: Limit result to the given number of relays and/or
             bridges.
         """
-
-        url = "{0.value}{1.value}".format(Endpoint.BASE, Endpoint.WEIGHTS)
-        response = await self._request("GET", url, params=kwargs)
-        return deserialise_response(response, relay_obj=RelayWeight)
+        return await self._get_document(
+            Endpoint.WEIGHTS, kwargs, relay_obj=RelayWeight
+        )
 
     @onionoo_parameterised(
         restrict={"fields","host_name","country","family","flag","contact"}
@@ -675,9 +1457,9 @@ class Client:
         :param int limit: Limit result to the given number of relays and/or
             bridges.
         """
-        url = "{0.value}{1.value}".format(Endpoint.BASE, Endpoint.CLIENTS)
-        response = await self._request("GET", url, params=kwargs)
-        return deserialise_response(response, bridge_obj=BridgeClients)
+        return await self._get_document(
+            Endpoint.CLIENTS, kwargs, bridge_obj=BridgeClients
+        )
 
     @onionoo_parameterised(
         restrict={"fields",}
@@ -760,8 +1542,6 @@ class Client:
         :param int limit: Limit result to the given number of relays and/or
             bridges.
         """
-        url = "{0.value}{1.value}".format(Endpoint.BASE, Endpoint.UPTIME)
-        response = await self._request("GET", url, params=kwargs)
-        return deserialise_response(
-            response, relay_obj=RelayUptime, bridge_obj=BridgeUptime
+        return await self._get_document(
+            Endpoint.UPTIME, kwargs, relay_obj=RelayUptime, bridge_obj=BridgeUptime
         )
@@ -0,0 +1,224 @@
+"""
+Implementation of :class:`Delta`, :class:`ResponseDelta` and :class:`Differ`.
+
+.. currentmodule:: garlic.diff
+"""
+
+import dataclasses
+import functools
+import hashlib
+import json
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from garlic import utils
+from garlic.types import Response
+
+# digest and descriptor, keyed by fingerprint.
+Digests = Dict[str, Tuple[bytes, Any]]
+
+
+def _key(descriptor) -> str:
+    """
+    Fingerprint of a relay, or hashed fingerprint of a bridge, whether
+    deserialised or raw.
+    """
+    if isinstance(descriptor, dict):
+        for name in ("fingerprint", "hashed_fingerprint", "f", "h"):
+            if name in descriptor:
+                return descriptor[name]
+        raise ValueError("descriptor has no fingerprint")
+    if (fingerprint := getattr(descriptor, "fingerprint", None)) is None:
+        fingerprint = descriptor.hashed_fingerprint
+    return fingerprint
+
+
+@functools.lru_cache(maxsize=None)
+def _field_names(cls: type) -> Tuple[str, ...]:
+    return tuple(field.name for field in dataclasses.fields(cls))
+
+
+def _record(descriptor) -> Dict[str, Any]:
+    """
+    Fields of a descriptor, whether deserialised or raw.
+    """
+    if isinstance(descriptor, dict):
+        return descriptor
+    if dataclasses.is_dataclass(descriptor):
+        return {
+            name: getattr(descriptor, name) for name in _field_names(type(descriptor))
+        }
+    return utils.attributes(descriptor)
+
+
+def _digest(descriptor) -> bytes:
+    """
+    Digest of the fields of a descriptor, whether deserialised or raw.
+    """
+    if isinstance(descriptor, dict):
+        text = json.dumps(descriptor, sort_keys=True)
+    else:
+        text = repr(tuple(_record(descriptor).values()))
+    return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+
+def digests(descriptors: Iterable) -> Digests:
+    """
+    Digest of each descriptor, keyed by fingerprint.
+
+    :param descriptors: Relay or bridge descriptors, deserialised or raw.
+    """
+    return {
+        _key(descriptor): (_digest(descriptor), descriptor)
+        for descriptor in descriptors
+    }
+
+
+@dataclasses.dataclass
+class Delta:
+    """
+    Differences between two sets of descriptors, keyed by fingerprint.
+
+    :param added: Descriptors which are only in the newer set.
+    :param removed: Descriptors which are only in the older set.
+    :param changed: Newer descriptors whose fields differ from the older
+        descriptor of the same fingerprint.
+    :param changes: Older and newer value of each differing field of the
+        changed descriptors.
+    """
+
+    added: Dict[str, Any] = dataclasses.field(default_factory=dict)
+    removed: Dict[str, Any] = dataclasses.field(default_factory=dict)
+    changed: Dict[str, Any] = dataclasses.field(default_factory=dict)
+    changes: Dict[str, Dict[str, Tuple[Any, Any]]] = dataclasses.field(
+        default_factory=dict
+    )
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed)
+
+    @classmethod
+    def between(cls, old: Digests, new: Digests) -> "Delta":
+        """
+        Compare two sets of descriptors, see :func:`digests`. Only the
+        fields of descriptors whose digests differ are compared.
+
+        :param old: Digests of the older descriptors.
+        :param new: Digests of the newer descriptors.
+        """
+        delta = cls()
+        for key, (digest, descriptor) in new.items():
+            if (previous := old.get(key)) is None:
+                delta.added[key] = descriptor
+            elif previous[0] != digest:
+                before, after = _record(previous[1]), _record(descriptor)
+                delta.changed[key] = descriptor
+                delta.changes[key] = {
+                    name: (before.get(name), after.get(name))
+                    for name in dict.fromkeys((*before, *after))
+                    if before.get(name) != after.get(name)
+                }
+        for key, (_, descriptor) in old.items():
+            if key not in new:
+                delta.removed[key] = descriptor
+        return delta
+
+    def apply(self, descriptors: Iterable) -> List:
+        """
+        Apply the differences to the older descriptors.
+
+        :param descriptors: Older descriptors.
+        :returns: Newer descriptors, retaining the order of the older
+            descriptors followed by the added descriptors.
+        """
+        applied = []
+        for descriptor in descriptors:
+            key = _key(descriptor)
+            if key not in self.removed:
+                applied.append(self.changed.get(key, descriptor))
+        applied.extend(self.added.values())
+        return applied
+
+
+@dataclasses.dataclass
+class ResponseDelta:
+    """
+    Differences between two documents.
+
+    :param relays: Differences between the relays.
+    :param bridges: Differences between the bridges.
+    :param relays_published: Publication of the relays of the newer document.
+    :param bridges_published: Publication of the bridges of the newer
+        document.
+    """
+
+    relays: Delta
+    bridges: Delta
+    relays_published: Any = None
+    bridges_published: Any = None
+
+    def __bool__(self) -> bool:
+        return bool(self.relays or self.bridges)
+
+    def apply(self, response: Response) -> Response:
+        """
+        Apply the differences to the older document.
+
+        :param response: Older document.
+        :returns: Newer document.
+        """
+        return dataclasses.replace(
+            response,
+            relays=self.relays.apply(response.relays),
+            bridges=self.bridges.apply(response.bridges),
+            relays_published=self.relays_published,
+            bridges_published=self.bridges_published,
+        )
+
+
+def diff(old: Response, new: Response) -> ResponseDelta:
+    """
+    Compare two documents, keyed by fingerprint.
+
+    :param old: Older document.
+    :param new: Newer document.
+    """
+    return ResponseDelta(
+        Delta.between(digests(old.relays), digests(new.relays)),
+        Delta.between(digests(old.bridges), digests(new.bridges)),
+        new.relays_published,
+        new.bridges_published,
+    )
+
+
+class Differ:
+    """
+    Compares each document with the previous one, retaining the digests of
+    the previous document so each document is digested once.
+    """
+
+    def __init__(self, response: Optional[Response] = None):
+        """
+        :param response: Initial document, every descriptor of the first
+            document passed to :meth:`update` is added otherwise.
+        """
+        self._relays: Digests = {}
+        self._bridges: Digests = {}
+        if response is not None:
+            self.update(response)
+
+    def update(self, response: Response) -> ResponseDelta:
+        """
+        Compare `response` with the previous document, then retain it.
+
+        :param response: Newer document.
+        """
+        relays, bridges = digests(response.relays), digests(response.bridges)
+        delta = ResponseDelta(
+            Delta.between(self._relays, relays),
+            Delta.between(self._bridges, bridges),
+            response.relays_published,
+            response.bridges_published,
+        )
+        self._relays, self._bridges = relays, bridges
+        return delta
@@ -47,3 +47,20 @@ class ServiceUnavailable(HTTPError):
     is already aware of.
     """
     pass
+
+
+class ConsensusChanged(Exception):
+    """
+    The API published a new network status while a document was being
+    requested in several parts, so the parts cannot be merged.
+    """
+    pass
+
+
+class CircuitOpen(Exception):
+    """
+    Requests to the API were rejected without being issued because recent
+    requests to the same host failed repeatedly, see
+    :class:`garlic.retry.CircuitBreaker`.
+    """
+    pass
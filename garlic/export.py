@@ -0,0 +1,457 @@
+"""
+Implementation of exporters writing documents to CSV, Arrow and Parquet.
+
+.. currentmodule:: garlic.export
+
+Exporters write the descriptors of a document in one of two layouts:
+
+* wide, a row per descriptor and a column per field. Lists are written as
+  list columns to Arrow and Parquet, and comma separated to CSV. Exit policy
+  summaries are written as their JSON. Histories are omitted.
+* long, with `history` set, a row per value of each history, see
+  :func:`garlic.history.histories`, whose columns are :data:`HISTORY_COLUMNS`.
+  Values are denormalised and null values are omitted.
+
+Both layouts begin with a `type` column, either "relay" or "bridge", so a
+document is written as a single table. Descriptors are written in batches of
+rows, so memory is bounded by the batch size rather than the document.
+
+Arrow and Parquet require PyArrow, installed with the `arrow` extra.
+"""
+
+import csv
+import datetime as dt
+import functools
+import json
+import typing
+
+from abc import ABC, abstractmethod
+from typing import (
+    Any,
+    AsyncIterable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    TextIO,
+    Tuple,
+    Union,
+)
+
+from garlic import utils
+from garlic.history import histories
+from garlic.types import (
+    BridgeClients,
+    BridgeBandwidth,
+    BridgeDetails,
+    BridgeSummary,
+    BridgeUptime,
+    ExitPolicy,
+    Flag,
+    LazyRelayDetails,
+    PartialBridgeDetails,
+    PartialRelayDetails,
+    RelayBandwidth,
+    RelayDetails,
+    RelaySummary,
+    RelayUptime,
+    RelayWeight,
+    Response,
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+#: Columns of the long layout, and their types.
+HISTORY_COLUMNS = (
+    ("type", str),
+    ("fingerprint", str),
+    ("metric", str),
+    ("period", str),
+    ("timestamp", dt.datetime),
+    ("value", float),
+)
+
+# relay and bridge descriptors of each document, the columns of the first
+# class of each are written.
+_DOCUMENTS = (
+    ((RelaySummary,), (BridgeSummary,)),
+    (
+        (RelayDetails, PartialRelayDetails, LazyRelayDetails),
+        (BridgeDetails, PartialBridgeDetails),
+    ),
+    ((RelayBandwidth,), (BridgeBandwidth,)),
+    ((RelayWeight,), ()),
+    ((), (BridgeClients,)),
+    ((RelayUptime,), (BridgeUptime,)),
+)
+
+Columns = Tuple[Tuple[str, type], ...]
+
+
+def _unwrap(annotation) -> type:
+    """
+    Type of a field, without :data:`python:typing.Optional`.
+    """
+    if typing.get_origin(annotation) is Union:
+        (annotation,) = (
+            argument
+            for argument in typing.get_args(annotation)
+            if argument is not type(None)
+        )
+    return annotation
+
+
+def _hints(cls: type) -> dict:
+    hints = typing.get_type_hints(cls)
+    if not hints:
+        hints = typing.get_type_hints(cls.__init__)
+        hints.pop("return", None)
+    return hints
+
+
+@functools.lru_cache(maxsize=None)
+def _document(cls: type) -> Columns:
+    """
+    Columns of the wide layout of the document of descriptor class `cls`.
+    """
+    for relays, bridges in _DOCUMENTS:
+        if issubclass(cls, relays + bridges):
+            break
+    else:
+        raise TypeError(f"cannot export {cls.__name__} descriptors")
+
+    columns = {"type": str}
+    for classes in (relays, bridges):
+        if not classes:
+            continue
+        for name, annotation in _hints(classes[0]).items():
+            annotation = _unwrap(annotation)
+            # histories are written by the long layout.
+            if typing.get_origin(annotation) is not dict:
+                columns.setdefault(name, annotation)
+    return tuple(columns.items())
+
+
+def _kind(descriptor) -> str:
+    for relays, _ in _DOCUMENTS:
+        if isinstance(descriptor, relays):
+            return "relay"
+    return "bridge"
+
+
+def _cell(value: Any) -> Any:
+    """
+    Value of a field as written, flags as strings and exit policy summaries
+    as JSON.
+    """
+    if isinstance(value, Flag):
+        return value.value
+    if isinstance(value, ExitPolicy):
+        return json.dumps(value.to_json())
+    if isinstance(value, list):
+        return [_cell(item) for item in value]
+    return value
+
+
+def rows(
+    descriptors: Iterable, history: bool = False
+) -> Tuple[Optional[Columns], Iterator[tuple]]:
+    """
+    Rows of descriptors in the wide or long layout.
+
+    :param descriptors: Descriptors of a single document.
+    :param history: Write the long layout of the histories of the
+        descriptors.
+    :returns: Columns, :class:`python:None` if there are no descriptors, and
+        an iterator over the rows.
+    """
+    descriptors = iter(descriptors)
+    try:
+        first = next(descriptors)
+    except StopIteration:
+        return None, iter(())
+
+    def chained():
+        yield first
+        yield from descriptors
+
+    if history:
+        return HISTORY_COLUMNS, _history_rows(chained())
+
+    columns = _document(type(first))
+    names = [name for name, _ in columns[1:]]
+    return columns, (
+        (_kind(descriptor), *(_cell(getattr(descriptor, name, None)) for name in names))
+        for descriptor in chained()
+    )
+
+
+def _history_rows(descriptors: Iterable) -> Iterator[tuple]:
+    for descriptor in descriptors:
+        kind = _kind(descriptor)
+        fingerprint = descriptor.fingerprint
+        for metric, period, series in histories(descriptor):
+            for index, value in enumerate(series.to_array()):
+                # null values are NaN.
+                if value == value:
+                    yield (
+                        kind,
+                        fingerprint,
+                        metric,
+                        period,
+                        series.first + index * series.interval,
+                        float(value),
+                    )
+
+
+def _batched(iterator: Iterator, size: int) -> Iterator[list]:
+    batch = []
+    for item in iterator:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _descriptors(source: Union[Response, Iterable]) -> Iterator:
+    """
+    Descriptors of a document, of an iterable over pages, or of an iterable
+    over descriptors.
+    """
+    if isinstance(source, Response):
+        yield from source.relays
+        yield from source.bridges
+        return
+    for item in source:
+        if isinstance(item, Response):
+            yield from _descriptors(item)
+        else:
+            yield item
+
+
+class Exporter(ABC):
+    """
+    Base class of the exporters. The columns are determined by the first
+    descriptor written, every descriptor must be of the same document.
+    """
+
+    def __init__(self, history: bool = False, batch_size: int = 10000):
+        """
+        :param history: Write the long layout of the histories of the
+            descriptors rather than the wide layout.
+        :param batch_size: Number of rows written at a time.
+        """
+        self.history = history
+        self.batch_size = batch_size
+        self.columns: Optional[Columns] = None
+        self.rows = 0
+
+    def write(self, source: Union[Response, Iterable]) -> int:
+        """
+        Write descriptors.
+
+        :param source: Document, iterable over pages, or iterable over
+            descriptors, such as a list or an archive section.
+        :returns: Number of rows written.
+        """
+        columns, iterator = rows(_descriptors(source), self.history)
+        if columns is None:
+            return 0
+        if self.columns is None:
+            self.columns = columns
+            self._open(columns)
+        elif columns != self.columns:
+            raise TypeError("descriptors are not of the document written")
+
+        written = 0
+        for batch in _batched(iterator, self.batch_size):
+            self._write(batch)
+            written += len(batch)
+        self.rows += written
+        return written
+
+    @abstractmethod
+    def _open(self, columns: Columns) -> None:
+        """
+        Begin writing rows of `columns`.
+        """
+        ...
+
+    @abstractmethod
+    def _write(self, batch: List[tuple]) -> None:
+        """
+        Write a batch of rows.
+        """
+        ...
+
+    def close(self) -> None:
+        """
+        Finish writing.
+        """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class CSVExporter(Exporter):
+    """
+    Writes descriptors as CSV, with a header row of the column names.
+    Timestamps are formatted as :data:`garlic.utils.UTC_FORMAT`.
+    """
+
+    def __init__(self, file: TextIO, history: bool = False, batch_size: int = 10000):
+        """
+        :param file: Text file, opened with ``newline=""``.
+        :param history: Write the long layout of the histories of the
+            descriptors rather than the wide layout.
+        :param batch_size: Number of rows written at a time.
+        """
+        super().__init__(history, batch_size)
+        self._writer = csv.writer(file)
+
+    @staticmethod
+    def _format(value: Any) -> Any:
+        if isinstance(value, dt.datetime):
+            return value.strftime(utils.UTC_FORMAT)
+        if isinstance(value, list):
+            return ",".join(str(item) for item in value)
+        return value
+
+    def _open(self, columns: Columns) -> None:
+        self._writer.writerow(name for name, _ in columns)
+
+    def _write(self, batch: List[tuple]) -> None:
+        self._writer.writerows(
+            [self._format(value) for value in row] for row in batch
+        )
+
+
+def _arrow_type(annotation: type) -> "pa.DataType":
+    if typing.get_origin(annotation) is list:
+        return pa.list_(pa.string())
+    return {
+        bool: pa.bool_(),
+        int: pa.int64(),
+        float: pa.float64(),
+        dt.datetime: pa.timestamp("s"),
+    }.get(annotation, pa.string())
+
+
+def schema(columns: Columns) -> "pa.Schema":
+    """
+    Arrow schema of columns, see :func:`rows`.
+
+    :param columns: Columns of the wide or long layout.
+    """
+    if pa is None:
+        raise ImportError("Arrow export requires PyArrow, install the arrow extra")
+    return pa.schema([(name, _arrow_type(annotation)) for name, annotation in columns])
+
+
+def record_batches(
+    source: Union[Response, Iterable], history: bool = False, batch_size: int = 10000
+) -> Iterator["pa.RecordBatch"]:
+    """
+    Iterate over descriptors as Arrow record batches.
+
+    :param source: Document, iterable over pages, or iterable over
+        descriptors.
+    :param history: Produce the long layout of the histories of the
+        descriptors rather than the wide layout.
+    :param batch_size: Number of rows per record batch.
+    """
+    columns, iterator = rows(_descriptors(source), history)
+    if columns is None:
+        return
+    arrow_schema = schema(columns)
+    for batch in _batched(iterator, batch_size):
+        yield _record_batch(arrow_schema, batch)
+
+
+def _record_batch(arrow_schema: "pa.Schema", batch: List[tuple]) -> "pa.RecordBatch":
+    return pa.RecordBatch.from_arrays(
+        [
+            pa.array(values, type=field.type)
+            for field, values in zip(arrow_schema, zip(*batch))
+        ],
+        schema=arrow_schema,
+    )
+
+
+class ArrowExporter(Exporter):
+    """
+    Writes descriptors as an Arrow IPC stream of record batches.
+    """
+
+    def __init__(self, sink, history: bool = False, batch_size: int = 10000):
+        """
+        :param sink: Path or binary file.
+        :param history: Write the long layout of the histories of the
+            descriptors rather than the wide layout.
+        :param batch_size: Number of rows per record batch.
+        """
+        if pa is None:
+            raise ImportError("Arrow export requires PyArrow, install the arrow extra")
+        super().__init__(history, batch_size)
+        self._sink = sink
+        self._schema = None
+        self._writer = None
+
+    def _open(self, columns: Columns) -> None:
+        self._schema = schema(columns)
+        self._writer = pa.ipc.new_stream(self._sink, self._schema)
+
+    def _write(self, batch: List[tuple]) -> None:
+        self._writer.write_batch(_record_batch(self._schema, batch))
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+
+class ParquetExporter(ArrowExporter):
+    """
+    Writes descriptors as a Parquet file, a row group per batch.
+    """
+
+    def _open(self, columns: Columns) -> None:
+        self._schema = schema(columns)
+        self._writer = pq.ParquetWriter(self._sink, self._schema)
+
+
+async def export(
+    source: Union[Response, Iterable, AsyncIterable],
+    exporter: Exporter,
+    batch_size: int = 1000,
+) -> int:
+    """
+    Write descriptors received asynchronously, such as by
+    :meth:`garlic.Client.stream` or the `iter_*` methods of
+    :class:`garlic.Client`, `batch_size` descriptors at a time.
+
+    :param source: Document, iterable over pages or descriptors, or
+        asynchronous iterable over pages or descriptors.
+    :param exporter: Exporter written to, which is not closed.
+    :param batch_size: Number of descriptors buffered before writing.
+    :returns: Number of rows written.
+    """
+    if not hasattr(source, "__aiter__"):
+        return exporter.write(source)
+
+    written = 0
+    batch = []
+    async for item in source:
+        batch.append(item)
+        if len(batch) == batch_size:
+            written += exporter.write(batch)
+            batch = []
+    return written + exporter.write(batch)
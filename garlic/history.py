@@ -0,0 +1,367 @@
+"""
+Implementation of :class:`HistoryStore`, :class:`AsyncHistoryStore` and
+:func:`histories`.
+
+.. currentmodule:: garlic.history
+"""
+
+import contextlib
+import datetime as dt
+import sqlite3
+import threading
+
+from typing import Iterable, Iterator, List, Optional, Tuple, Union
+
+import anyio
+
+from garlic import utils
+from garlic.types import (
+    BridgeDescriptor,
+    Flag,
+    GraphHistory,
+    RelayDescriptor,
+    Response,
+)
+
+Point = Tuple[dt.datetime, float]
+
+
+def histories(
+    descriptor: Union[RelayDescriptor, BridgeDescriptor]
+) -> Iterator[Tuple[str, str, GraphHistory]]:
+    """
+    Histories of a bandwidth, weights, clients or uptime descriptor. The
+    histories of each flag of :class:`garlic.types.RelayUptime` are named
+    "flags/<flag>".
+
+    :param descriptor: Relay or bridge descriptor, descriptors without
+        histories yield none.
+    :returns: Name, period and history of each history.
+    """
+    for metric, value in utils.attributes(descriptor).items():
+        if not isinstance(value, dict):
+            continue
+        for key, history in value.items():
+            if isinstance(history, GraphHistory):
+                yield metric, key, history
+            elif isinstance(history, dict):
+                name = key.value if isinstance(key, Flag) else key
+                for period, flagged in history.items():
+                    yield f"{metric}/{name}", period, flagged
+
+
+class HistoryStore:
+    """
+    Append-only store of history data points persisted to an SQLite
+    database, keyed by fingerprint, metric and period.
+
+    Histories returned by the API cover fixed windows which overlap between
+    requests, points already stored are ignored so each window extends the
+    stored series. Values are stored denormalised, whether or not
+    :meth:`GraphHistory.denormalise` was called, and null values are omitted.
+
+    Every operation blocks until the database answers, use
+    :class:`AsyncHistoryStore` alongside a :class:`garlic.Client`.
+    """
+
+    def __init__(self, path: str = ":memory:", timeout: float = 30.0):
+        """
+        :param path: Path to the database, created if absent. The store is
+            held in memory if ":memory:".
+        :param timeout: Duration (seconds) to wait for a lock held by another
+            process.
+        """
+        self._path = path
+        self._timeout = timeout
+        # an in-memory database only lives as long as its connection, which
+        # is shared between threads one at a time.
+        self._memory = None
+        if path == ":memory:":
+            self._memory = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+
+        with self._connect() as db:
+            if self._memory is None:
+                db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS points ("
+                "fingerprint TEXT NOT NULL, "
+                "metric TEXT NOT NULL, "
+                "period TEXT NOT NULL, "
+                "timestamp INTEGER NOT NULL, "
+                "value REAL NOT NULL, "
+                "PRIMARY KEY (fingerprint, metric, period, timestamp)"
+                ") WITHOUT ROWID"
+            )
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """
+        Connection to the database, committing on success. Connections to a
+        database file are not shared so the store may be used from several
+        threads or processes.
+        """
+        if self._memory is not None:
+            with self._lock, self._memory:
+                yield self._memory
+            return
+
+        db = sqlite3.connect(self._path, timeout=self._timeout)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def close(self) -> None:
+        """
+        Close the in-memory database, discarding it.
+        """
+        if self._memory is not None:
+            with self._lock:
+                self._memory.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @staticmethod
+    def _timestamp(timestamp: dt.datetime) -> int:
+        return int(timestamp.replace(tzinfo=dt.timezone.utc).timestamp())
+
+    @staticmethod
+    def _datetime(timestamp: int) -> dt.datetime:
+        timestamp = dt.datetime.fromtimestamp(timestamp, dt.timezone.utc)
+        return timestamp.replace(tzinfo=None)
+
+    def add(
+        self, fingerprint: str, metric: str, period: str, history: GraphHistory
+    ) -> int:
+        """
+        Store the points of a history.
+
+        :param fingerprint: Fingerprint of the relay, or hashed fingerprint of
+            the bridge.
+        :param metric: Name of the history, such as "write_history".
+        :param period: Period of the history, such as "1_month".
+        :param history: History whose points are stored.
+        :returns: Number of points which were not already stored.
+        """
+        return self._insert(self._points(fingerprint, metric, period, history))
+
+    def ingest(
+        self,
+        descriptors: Union[
+            Response, Iterable[Union[RelayDescriptor, BridgeDescriptor]]
+        ],
+    ) -> int:
+        """
+        Store every history of bandwidth, weights, clients or uptime
+        descriptors, named as by :func:`histories`.
+
+        :param descriptors: Document, or its relays and bridges.
+        :returns: Number of points which were not already stored.
+        """
+        if isinstance(descriptors, Response):
+            descriptors = descriptors.relays + descriptors.bridges
+
+        return self._insert(
+            point
+            for descriptor in descriptors
+            for metric, period, history in histories(descriptor)
+            for point in self._points(descriptor.fingerprint, metric, period, history)
+        )
+
+    def _points(
+        self, fingerprint: str, metric: str, period: str, history: GraphHistory
+    ) -> Iterable[tuple]:
+        first = self._timestamp(history.first)
+        interval = int(history.interval.total_seconds())
+        for index, value in enumerate(history.to_array()):
+            # null values are NaN.
+            if value == value:
+                yield (
+                    fingerprint,
+                    metric,
+                    period,
+                    first + index * interval,
+                    float(value),
+                )
+
+    def _insert(self, points: Iterable[tuple]) -> int:
+        with self._connect() as db:
+            before = db.total_changes
+            db.executemany(
+                "INSERT OR IGNORE INTO points VALUES (?, ?, ?, ?, ?)", points
+            )
+            return db.total_changes - before
+
+    def _select(self, query: str, params: tuple) -> list:
+        with self._connect() as db:
+            return db.execute(query, params).fetchall()
+
+    def query(
+        self,
+        fingerprint: str,
+        metric: str,
+        period: str,
+        start: Optional[dt.datetime] = None,
+        end: Optional[dt.datetime] = None,
+    ) -> List[Point]:
+        """
+        Stored points of a series within a time range, in chronological order.
+
+        :param fingerprint: Fingerprint of the relay, or hashed fingerprint of
+            the bridge.
+        :param metric: Name of the history.
+        :param period: Period of the history.
+        :param start: UTC timestamp of the first point, inclusive.
+            Unbounded if :class:`python:None`.
+        :param end: UTC timestamp of the last point, inclusive. Unbounded if
+            :class:`python:None`.
+        :returns: UTC timestamp and denormalised value of each point.
+        """
+        rows = self._select(
+            "SELECT timestamp, value FROM points "
+            "WHERE fingerprint = ? AND metric = ? AND period = ? "
+            "AND timestamp >= ? AND timestamp <= ? ORDER BY timestamp",
+            (
+                fingerprint,
+                metric,
+                period,
+                -(2 ** 62) if start is None else self._timestamp(start),
+                2 ** 62 if end is None else self._timestamp(end),
+            ),
+        )
+        return [(self._datetime(timestamp), value) for timestamp, value in rows]
+
+    def series(
+        self, fingerprint: Optional[str] = None
+    ) -> List[Tuple[str, str, str]]:
+        """
+        Stored series.
+
+        :param fingerprint: Only return the series of this relay or bridge.
+        :returns: Fingerprint, metric and period of each series.
+        """
+        if fingerprint is None:
+            return self._select(
+                "SELECT DISTINCT fingerprint, metric, period FROM points", ()
+            )
+        return self._select(
+            "SELECT DISTINCT fingerprint, metric, period FROM points "
+            "WHERE fingerprint = ?",
+            (fingerprint,),
+        )
+
+    def latest(
+        self, fingerprint: str, metric: str, period: str
+    ) -> Optional[dt.datetime]:
+        """
+        UTC timestamp of the most recent stored point of a series.
+
+        :param fingerprint: Fingerprint of the relay, or hashed fingerprint of
+            the bridge.
+        :param metric: Name of the history.
+        :param period: Period of the history.
+        """
+        ((timestamp,),) = self._select(
+            "SELECT MAX(timestamp) FROM points "
+            "WHERE fingerprint = ? AND metric = ? AND period = ?",
+            (fingerprint, metric, period),
+        )
+        return None if timestamp is None else self._datetime(timestamp)
+
+
+class AsyncHistoryStore:
+    """
+    :class:`HistoryStore` whose operations are executed in a worker thread,
+    so they do not block the event loop.
+    """
+
+    def __init__(self, store: HistoryStore):
+        """
+        :param store: Store the operations are executed on.
+        """
+        self.store = store
+
+    @classmethod
+    async def open(
+        cls, path: str = ":memory:", timeout: float = 30.0
+    ) -> "AsyncHistoryStore":
+        """
+        Open a :class:`HistoryStore` in a worker thread.
+
+        :param path: Path to the database, see :class:`HistoryStore`.
+        :param timeout: Duration (seconds) to wait for a lock held by another
+            process.
+        """
+        return cls(await anyio.run_in_thread(HistoryStore, path, timeout))
+
+    async def close(self) -> None:
+        """
+        See :meth:`HistoryStore.close`.
+        """
+        await anyio.run_in_thread(self.store.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def add(
+        self, fingerprint: str, metric: str, period: str, history: GraphHistory
+    ) -> int:
+        """
+        See :meth:`HistoryStore.add`.
+        """
+        return await anyio.run_in_thread(
+            self.store.add, fingerprint, metric, period, history
+        )
+
+    async def ingest(
+        self,
+        descriptors: Union[
+            Response, Iterable[Union[RelayDescriptor, BridgeDescriptor]]
+        ],
+    ) -> int:
+        """
+        See :meth:`HistoryStore.ingest`.
+        """
+        return await anyio.run_in_thread(self.store.ingest, descriptors)
+
+    async def query(
+        self,
+        fingerprint: str,
+        metric: str,
+        period: str,
+        start: Optional[dt.datetime] = None,
+        end: Optional[dt.datetime] = None,
+    ) -> List[Point]:
+        """
+        See :meth:`HistoryStore.query`.
+        """
+        return await anyio.run_in_thread(
+            self.store.query, fingerprint, metric, period, start, end
+        )
+
+    async def series(
+        self, fingerprint: Optional[str] = None
+    ) -> List[Tuple[str, str, str]]:
+        """
+        See :meth:`HistoryStore.series`.
+        """
+        return await anyio.run_in_thread(self.store.series, fingerprint)
+
+    async def latest(
+        self, fingerprint: str, metric: str, period: str
+    ) -> Optional[dt.datetime]:
+        """
+        See :meth:`HistoryStore.latest`.
+        """
+        return await anyio.run_in_thread(
+            self.store.latest, fingerprint, metric, period
+        )
@@ -0,0 +1,369 @@
+"""
+Implementation of indexes over the descriptors of a document.
+
+.. currentmodule:: garlic.index
+"""
+
+import array
+import bisect
+import typing
+
+from typing import Iterable, List, Optional, Set, Tuple, Union
+
+from garlic import utils
+from garlic.types import (
+    BridgeDescriptor,
+    PortRanges,
+    RelayDescriptor,
+    RelayDetailsBase,
+    Response,
+)
+
+
+class ExitPortIndex:
+    """
+    Index of the exit relays permitting each port.
+
+    The port space is split into segments at every boundary of every exit
+    policy, within a segment every port is permitted by the same relays. The
+    relays and their total exit probability are computed once per segment,
+    so each query is a binary search over the segments.
+    """
+
+    def __init__(self, relays: Iterable[RelayDetailsBase], ipv6: bool = True):
+        """
+        Instantiate `ExitPortIndex` object.
+
+        :param relays: Relay details, relays without an exit policy summary
+            are ignored.
+        :param ipv6: Consider ports permitted by the IPv6 exit policy summary.
+        """
+        policies = []
+        for relay in relays:
+            ports = PortRanges()
+            if (policy := getattr(relay, "exit_policy_summary", None)) is not None:
+                ports |= policy.ports
+            if ipv6 and (
+                policy := getattr(relay, "exit_policy_v6_summary", None)
+            ) is not None:
+                ports |= policy.ports
+            if ports:
+                policies.append((relay, ports))
+
+        # a relay enters the active set at the first port of each range and
+        # leaves it after the last.
+        events = {}
+        for index, (_, ports) in enumerate(policies):
+            for first, last in ports.ranges:
+                events.setdefault(first, []).append((index, True))
+                events.setdefault(last + 1, []).append((index, False))
+
+        self._starts = []
+        self._exits = []
+        self._probabilities = []
+        active = set()
+        for port in sorted(events):
+            for index, entering in events[port]:
+                if entering:
+                    active.add(index)
+                else:
+                    active.discard(index)
+
+            exits = tuple(policies[index][0] for index in sorted(active))
+            self._starts.append(port)
+            self._exits.append(exits)
+            self._probabilities.append(
+                sum(relay.exit_probability or 0.0 for relay in exits)
+            )
+
+        self._ranking = sorted(
+            (
+                (start, end - 1, probability)
+                for start, end, probability in zip(
+                    self._starts,
+                    self._starts[1:] + [PortRanges.MAX_PORT + 1],
+                    self._probabilities,
+                )
+                if probability and start <= PortRanges.MAX_PORT
+            ),
+            key=lambda segment: (-segment[2], segment[0]),
+        )
+
+    @classmethod
+    def from_response(cls, response: Response, ipv6: bool = True) -> "ExitPortIndex":
+        """
+        Instantiate from a details document.
+
+        :param response: Details document, requested with the exit policy
+            summaries and exit probability if fields are restricted.
+        :param ipv6: Consider ports permitted by the IPv6 exit policy summary.
+        """
+        return cls(response.relays, ipv6=ipv6)
+
+    def _segment(self, port: int) -> Optional[int]:
+        index = bisect.bisect_right(self._starts, port) - 1
+        return index if index >= 0 else None
+
+    def exits(self, port: int) -> Tuple[RelayDetailsBase, ...]:
+        """
+        Relays permitting exits to `port`.
+
+        :param port: Destination port.
+        """
+        if (index := self._segment(port)) is None:
+            return ()
+        return self._exits[index]
+
+    def exit_probability(self, port: int) -> float:
+        """
+        Total exit probability of the relays permitting exits to `port`.
+
+        :param port: Destination port.
+        """
+        if (index := self._segment(port)) is None:
+            return 0.0
+        return self._probabilities[index]
+
+    def ranked_ports(
+        self, ports: Optional[Iterable[int]] = None, limit: Optional[int] = None
+    ) -> List[Tuple[int, int, float]]:
+        """
+        Ports ordered by descending total exit probability.
+
+        :param ports: Ports to rank, each returned as a single port range.
+            Every port is ranked if :class:`python:None`, consecutive ports
+            with the same exits are returned as a single range.
+        :param limit: Maximum number of ranges returned.
+        :returns: Tuples of the first and last port of each range and its
+            total exit probability. Ranges without exit probability are
+            omitted when ranking every port.
+        """
+        if ports is None:
+            ranking = self._ranking
+        else:
+            ranking = sorted(
+                ((port, port, self.exit_probability(port)) for port in set(ports)),
+                key=lambda segment: (-segment[2], segment[0]),
+            )
+        return ranking[:limit]
+
+
+def _address(address: str) -> str:
+    """
+    IP address of an address optionally followed by a port, without the
+    brackets enclosing IPv6 addresses.
+    """
+    if address.startswith("["):
+        return address[1 : address.find("]")].lower()
+    if address.count(":") == 1:
+        return address.partition(":")[0]
+    return address.lower()
+
+
+class _SortedKeys:
+    """
+    Sorted keys of descriptors, searched by prefix with a binary search.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, int]]):
+        entries = sorted(entries)
+        self.keys = [key for key, _ in entries]
+        self.positions = [position for _, position in entries]
+
+    def prefixed(self, prefix: str) -> List[int]:
+        first = bisect.bisect_left(self.keys, prefix)
+        last = bisect.bisect_left(self.keys, prefix + "\U0010ffff", first)
+        return self.positions[first:last]
+
+
+class _SuffixArray:
+    """
+    Sorted suffixes of the keys of descriptors, searched by prefix with a
+    binary search. Each suffix is held as the index of its key and its start
+    rather than as a copy, so the array grows linearly with the keys.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, int]]):
+        self.keys = []
+        self.positions = []
+        suffixes = []
+        for key, position in entries:
+            suffixes.extend((len(self.keys), start) for start in range(len(key)))
+            self.keys.append(key)
+            self.positions.append(position)
+
+        # suffixes are only copied while sorting.
+        suffixes.sort(key=lambda suffix: self.keys[suffix[0]][suffix[1] :])
+        self.indices = array.array("I", (index for index, _ in suffixes))
+        self.starts = array.array("I", (start for _, start in suffixes))
+
+    def _head(self, suffix: int, length: int) -> str:
+        """
+        First `length` characters of a suffix.
+        """
+        start = self.starts[suffix]
+        return self.keys[self.indices[suffix]][start : start + length]
+
+    def prefixed(self, prefix: str) -> List[int]:
+        length = len(prefix)
+        low, high = 0, len(self.starts)
+        while low < high:
+            middle = (low + high) // 2
+            if self._head(middle, length) < prefix:
+                low = middle + 1
+            else:
+                high = middle
+        first, high = low, len(self.starts)
+        while low < high:
+            middle = (low + high) // 2
+            if self._head(middle, length) <= prefix:
+                low = middle + 1
+            else:
+                high = middle
+        return [self.positions[self.indices[suffix]] for suffix in range(first, low)]
+
+
+# relays are looked up by the hash of their fingerprint, bridges are not.
+_RELAY_TYPES = typing.get_args(RelayDescriptor)
+
+
+class SearchIndex:
+    """
+    Index of relays and bridges by fingerprint, nickname and address.
+
+    Fingerprints and hashed fingerprints are looked up in a dictionary.
+    Fingerprints, nicknames and addresses are kept in sorted arrays searched
+    by prefix, nicknames are searched by substring through a suffix array.
+    Summary and details descriptors are both accepted, and relays and bridges
+    may be mixed.
+    """
+
+    def __init__(
+        self, descriptors: Iterable[Union[RelayDescriptor, BridgeDescriptor]]
+    ):
+        """
+        Instantiate `SearchIndex` object.
+
+        :param descriptors: Relay and bridge descriptors.
+        """
+        self.descriptors = list(descriptors)
+        self._exact = {}
+
+        fingerprints, nicknames, addresses = [], [], []
+        for position, descriptor in enumerate(self.descriptors):
+            # bridges of the history documents hold their hashed fingerprint
+            # in `fingerprint`.
+            fingerprint = (
+                getattr(descriptor, "fingerprint", None)
+                or getattr(descriptor, "hashed_fingerprint", None)
+                or ""
+            ).upper()
+            # the API looks relays up by their hashed fingerprint too.
+            if fingerprint and isinstance(descriptor, _RELAY_TYPES):
+                self._exact.setdefault(utils.hash_fingerprint(fingerprint), position)
+            if fingerprint:
+                self._exact.setdefault(fingerprint, position)
+                fingerprints.append((fingerprint, position))
+
+            if nickname := (getattr(descriptor, "nickname", None) or "").lower():
+                nicknames.append((nickname, position))
+
+            for address in (
+                getattr(descriptor, "addresses", None)
+                or getattr(descriptor, "or_addresses", None)
+                or ()
+            ):
+                addresses.append((_address(address), position))
+
+        self._fingerprints = _SortedKeys(fingerprints)
+        self._nicknames = _SortedKeys(nicknames)
+        self._suffixes = _SuffixArray(nicknames)
+        self._addresses = _SortedKeys(addresses)
+
+    @classmethod
+    def from_response(cls, response: Response) -> "SearchIndex":
+        """
+        Instantiate from the relays and bridges of a document.
+
+        :param response: Summary or details document.
+        """
+        return cls(response.relays + response.bridges)
+
+    def _resolve(self, positions: Iterable[int]) -> list:
+        return [self.descriptors[position] for position in sorted(set(positions))]
+
+    def lookup(
+        self, fingerprint: str
+    ) -> Optional[Union[RelayDescriptor, BridgeDescriptor]]:
+        """
+        Descriptor with the fingerprint or hashed fingerprint `fingerprint`,
+        case-insensitive.
+
+        :param fingerprint: Fingerprint, or hashed fingerprint, of 40
+            hexadecimal characters.
+        """
+        position = self.position(fingerprint)
+        return None if position is None else self.descriptors[position]
+
+    def position(self, fingerprint: str) -> Optional[int]:
+        """
+        Position of the descriptor with the fingerprint or hashed fingerprint
+        `fingerprint`, see :meth:`lookup`.
+
+        :param fingerprint: Fingerprint, or hashed fingerprint, of 40
+            hexadecimal characters.
+        """
+        return self._exact.get(fingerprint.lstrip("$").upper())
+
+    def by_fingerprint(self, prefix: str) -> list:
+        """
+        Descriptors whose fingerprint, or hashed fingerprint for bridges,
+        starts with `prefix`, case-insensitive.
+
+        :param prefix: Beginning of the fingerprint, optionally prefixed with
+            "$".
+        """
+        return self._resolve(self._fingerprints.prefixed(prefix.lstrip("$").upper()))
+
+    def by_nickname(self, text: str, substring: bool = False) -> list:
+        """
+        Descriptors whose nickname starts with, or contains, `text`,
+        case-insensitive.
+
+        :param text: Beginning or part of the nickname.
+        :param substring: Match `text` anywhere in the nickname.
+        """
+        keys = self._suffixes if substring else self._nicknames
+        return self._resolve(keys.prefixed(text.lower()))
+
+    def by_address(self, prefix: str) -> list:
+        """
+        Descriptors with an address starting with `prefix`.
+
+        :param prefix: Beginning of an IPv4 or IPv6 address, IPv6 addresses
+            may be enclosed in square brackets.
+        """
+        return self._resolve(self._addresses.prefixed(prefix.strip("[]").lower()))
+
+    def match(self, term: str) -> Set[int]:
+        """
+        Positions of the descriptors matching a term of the `search`
+        parameter: part of the nickname, beginning of the (hashed)
+        fingerprint or beginning of an address.
+
+        :param term: Search term.
+        """
+        return {
+            *self._suffixes.prefixed(term.lower()),
+            *self._fingerprints.prefixed(term.lstrip("$").upper()),
+            *self._addresses.prefixed(term.strip("[]").lower()),
+        }
+
+    def search(self, term: str) -> list:
+        """
+        Descriptors matching a term of the `search` parameter, see
+        :meth:`match`, in the order they were indexed.
+
+        :param term: Search term.
+        """
+        return self._resolve(self.match(term))
@@ -0,0 +1,414 @@
+"""
+Implementation of :class:`QueryEngine`.
+
+.. currentmodule:: garlic.query
+"""
+
+import dataclasses
+import datetime as dt
+import math
+import re
+
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from garlic import utils
+from garlic.index import SearchIndex
+from garlic.types import (
+    Flag,
+    PartialBridgeDetails,
+    PartialRelayDetails,
+    Response,
+)
+
+#: Parameters which only select relays, bridges are excluded if any is given.
+RELAY_PARAMETERS = frozenset(
+    {"country", "as_", "as_name", "family", "contact", "host_name"}
+)
+
+#: Parameters evaluated by :meth:`QueryEngine.query`.
+PARAMETERS = RELAY_PARAMETERS | {
+    "type",
+    "running",
+    "search",
+    "lookup",
+    "fingerprint",
+    "flag",
+    "first_seen_days",
+    "last_seen_days",
+    "version",
+    "os",
+    "recommended_version",
+    "fields",
+    "order",
+    "offset",
+    "limit",
+}
+
+# parameters which may qualify a term of the `search` parameter.
+_QUALIFIERS = PARAMETERS - {"search", "fields", "order", "offset", "limit"}
+
+
+def _split(value: Union[str, Iterable[str]]) -> List[str]:
+    """
+    List of the comma separated values of a parameter.
+    """
+    if isinstance(value, str):
+        value = value.split(",")
+    return [item.strip() for item in value if item.strip()]
+
+
+def _boolean(value: Union[bool, str]) -> bool:
+    if isinstance(value, str):
+        return value.lower() == "true"
+    return bool(value)
+
+
+def _days(value: str) -> Tuple[int, float]:
+    """
+    Bounds of a range of days, formatted as "x-y", "x", "x-" or "-y".
+    """
+    first, separator, last = str(value).partition("-")
+    lower = int(first) if first else 0
+    if not separator:
+        return lower, lower
+    return lower, int(last) if last else math.inf
+
+
+def _version(version: str) -> Tuple[int, ...]:
+    """
+    Numeric components of a Tor version, ignoring any status tag.
+    """
+    return tuple(int(part) for part in re.findall(r"\d+", version.split("-")[0]))
+
+
+def _timestamp(value: Union[str, dt.datetime, None]) -> Optional[dt.datetime]:
+    if isinstance(value, str):
+        return utils.decode_utc(value)
+    return value
+
+
+class QueryEngine:
+    """
+    Evaluates the parameters of :meth:`garlic.Client.get_details` against a
+    locally held details document, without requesting the API.
+
+    Relays and bridges are indexed by fingerprint, hashed fingerprint,
+    country, autonomous system and flag, and by :class:`garlic.index.SearchIndex`
+    for the `lookup` and `search` parameters, so the parameters using them
+    select candidates by lookup before the remaining parameters are tested.
+    """
+
+    def __init__(self, response: Response, now: Optional[dt.datetime] = None):
+        """
+        Instantiate `QueryEngine` object.
+
+        :param response: Details document of every relay and bridge, whose
+            fields were not restricted.
+        :param now: UTC timestamp `first_seen_days` and `last_seen_days` are
+            relative to. Defaults to the publication of the document.
+        """
+        self.response = response
+        self.relays = list(response.relays)
+        self.bridges = list(response.bridges)
+        self._relays_published = _timestamp(response.relays_published)
+        self._bridges_published = _timestamp(response.bridges_published)
+        self._now = now
+        self._relay_search = SearchIndex(self.relays)
+        self._bridge_search = SearchIndex(self.bridges)
+
+        self._fingerprints: Dict[str, int] = {}
+        self._countries: Dict[str, Set[int]] = {}
+        self._autonomous_systems: Dict[str, Set[int]] = {}
+        self._relay_flags: Dict[str, Set[int]] = {}
+        for index, relay in enumerate(self.relays):
+            if relay.fingerprint:
+                self._fingerprints[relay.fingerprint.upper()] = index
+            country = (relay.country or "xz").lower()
+            self._countries.setdefault(country, set()).add(index)
+            system = self._as_number(relay.as_ or "0")
+            self._autonomous_systems.setdefault(system, set()).add(index)
+            for flag in relay.flags or ():
+                self._relay_flags.setdefault(flag.lower(), set()).add(index)
+
+        self._bridge_flags: Dict[str, Set[int]] = {}
+        for index, bridge in enumerate(self.bridges):
+            for flag in bridge.flags or ():
+                self._bridge_flags.setdefault(flag.lower(), set()).add(index)
+
+    @staticmethod
+    def _as_number(value: str) -> str:
+        value = value.strip().upper()
+        return value[2:] if value.startswith("AS") else value
+
+    def query(self, **kwargs) -> Response:
+        """
+        Select the relays and bridges matching the parameters, as the API
+        would.
+
+        :param kwargs: Parameters accepted by :meth:`garlic.Client.get_details`,
+            either as passed to it or as sent to the API.
+        :raises TypeError: A parameter is not supported.
+        """
+        params = dict(kwargs)
+        if params.get("search"):
+            # qualified terms, such as "country:de", are parameters.
+            terms = []
+            for term in params["search"].split():
+                key, separator, value = term.partition(":")
+                key = "as_" if key == "as" else key
+                if separator and key in _QUALIFIERS:
+                    params[key] = value
+                else:
+                    terms.append(term)
+            params["search"] = terms
+
+        if "as" in params:
+            params["as_"] = params.pop("as")
+        if unknown := params.keys() - PARAMETERS:
+            raise TypeError(f"unsupported parameters: {', '.join(sorted(unknown))}")
+        params = {key: value for key, value in params.items() if value is not None}
+
+        kind = params.get("type")
+        relays = []
+        if kind in (None, "relay"):
+            relays = [self.relays[index] for index in self._select_relays(params)]
+        bridges = []
+        if kind in (None, "bridge") and not params.keys() & RELAY_PARAMETERS:
+            bridges = [self.bridges[index] for index in self._select_bridges(params)]
+
+        if order := params.get("order"):
+            relays = self._order(relays, _split(order))
+            bridges = self._order(bridges, _split(order))
+
+        offset = int(params.get("offset", 0))
+        relays_skipped = min(offset, len(relays))
+        bridges_skipped = min(offset - relays_skipped, len(bridges))
+        relays = relays[relays_skipped:]
+        bridges = bridges[bridges_skipped:]
+
+        relays_truncated = bridges_truncated = 0
+        if (limit := params.get("limit")) is not None:
+            limit = int(limit)
+            relays_truncated = max(0, len(relays) - limit)
+            relays = relays[:limit]
+            bridges_truncated = max(0, len(bridges) - (limit - len(relays)))
+            bridges = bridges[: limit - len(relays)]
+
+        if fields := params.get("fields"):
+            fields = set(_split(fields))
+            relays = [
+                self._partial(PartialRelayDetails, relay, fields) for relay in relays
+            ]
+            bridges = [
+                self._partial(PartialBridgeDetails, bridge, fields)
+                for bridge in bridges
+            ]
+
+        return dataclasses.replace(
+            self.response,
+            relays=relays,
+            bridges=bridges,
+            relays_skipped=relays_skipped,
+            relays_truncated=relays_truncated,
+            bridges_skipped=bridges_skipped,
+            bridges_truncated=bridges_truncated,
+        )
+
+    def _select_relays(self, params: dict) -> List[int]:
+        """
+        Indices of the relays matching `params`, in document order.
+        """
+        candidates = None
+
+        def narrow(indices: Iterable[int]) -> None:
+            nonlocal candidates
+            indices = set(indices)
+            candidates = indices if candidates is None else candidates & indices
+
+        if "lookup" in params:
+            index = self._relay_search.position(params["lookup"])
+            narrow(() if index is None else (index,))
+        if "fingerprint" in params:
+            index = self._fingerprints.get(params["fingerprint"].upper())
+            narrow(() if index is None else (index,))
+        for term in params.get("search", ()):
+            narrow(self._relay_search.match(term))
+        if "country" in params:
+            narrow(self._countries.get(params["country"].lower(), ()))
+        if "as_" in params:
+            narrow(
+                index
+                for system in _split(params["as_"])
+                for index in self._autonomous_systems.get(self._as_number(system), ())
+            )
+        if "flag" in params:
+            narrow(self._relay_flags.get(self._flag(params["flag"]), ()))
+        if "family" in params:
+            narrow(self._family(params["family"]))
+
+        if candidates is None:
+            candidates = range(len(self.relays))
+        published = self._now or self._relays_published
+        predicates = self._predicates(params, published)
+        return [
+            index
+            for index in sorted(candidates)
+            if all(predicate(self.relays[index]) for predicate in predicates)
+        ]
+
+    def _select_bridges(self, params: dict) -> List[int]:
+        """
+        Indices of the bridges matching `params`, in document order.
+        """
+        candidates = range(len(self.bridges))
+        if "lookup" in params:
+            index = self._bridge_search.position(params["lookup"])
+            candidates = () if index is None else (index,)
+        for term in params.get("search", ()):
+            matches = self._bridge_search.match(term)
+            candidates = [index for index in candidates if index in matches]
+        if "fingerprint" in params:
+            # bridges are selected by their hashed fingerprint.
+            index = self._bridge_search.position(params["fingerprint"])
+            candidates = [i for i in candidates if i == index]
+        if "flag" in params:
+            flagged = self._bridge_flags.get(self._flag(params["flag"]), set())
+            candidates = [index for index in candidates if index in flagged]
+
+        published = self._now or self._bridges_published
+        predicates = self._predicates(params, published)
+        return [
+            index
+            for index in candidates
+            if all(predicate(self.bridges[index]) for predicate in predicates)
+        ]
+
+    @staticmethod
+    def _flag(flag: Union[Flag, str]) -> str:
+        return (flag.value if isinstance(flag, Flag) else flag).lower()
+
+    def _family(self, fingerprint: str) -> List[int]:
+        """
+        Indices of the relay and the members of its effective family.
+        """
+        index = self._fingerprints.get(fingerprint.lstrip("$").upper())
+        if index is None:
+            return []
+        members = [index]
+        for member in self.relays[index].effective_family or ():
+            member = self._fingerprints.get(member.lstrip("$").upper())
+            if member is not None:
+                members.append(member)
+        return members
+
+    def _predicates(
+        self, params: dict, published: dt.datetime
+    ) -> List[Callable[[object], bool]]:
+        """
+        Tests of the parameters which are not answered by an index.
+        """
+        predicates = []
+
+        if "running" in params:
+            running = _boolean(params["running"])
+            predicates.append(lambda node: bool(node.running) == running)
+
+        if "recommended_version" in params:
+            recommended = _boolean(params["recommended_version"])
+            predicates.append(
+                lambda node: node.recommended_version is not None
+                and node.recommended_version == recommended
+            )
+
+        def seen_days(field, lower, upper):
+            def match(node):
+                if (timestamp := getattr(node, field)) is None:
+                    return False
+                return lower <= (published - timestamp).days <= upper
+
+            return match
+
+        for field in ("first_seen", "last_seen"):
+            if (days := params.get(field + "_days")) is not None:
+                predicates.append(seen_days(field, *_days(days)))
+
+        if "version" in params:
+            ranges = []
+            for item in _split(params["version"]):
+                first, separator, last = item.partition("..")
+                if separator:
+                    ranges.append((_version(first), _version(last)))
+                else:
+                    ranges.append((_version(item), _version(item)))
+
+            def match_version(node):
+                if not node.version:
+                    return False
+                version = _version(node.version)
+                return any(
+                    version[: len(first)] >= first
+                    and (not last or version[: len(last)] <= last)
+                    for first, last in ranges
+                )
+
+            predicates.append(match_version)
+
+        if "os" in params:
+            system = params["os"].lower()
+            predicates.append(
+                lambda node: bool(node.platform)
+                and node.platform.lower().partition(" on ")[2].startswith(system)
+            )
+
+        if "as_name" in params:
+            parts = params["as_name"].lower().split()
+            predicates.append(
+                lambda node: bool(node.as_name)
+                and all(part in node.as_name.lower() for part in parts)
+            )
+
+        if "contact" in params:
+            parts = params["contact"].lower().split()
+            predicates.append(
+                lambda node: bool(node.contact)
+                and all(part in node.contact.lower() for part in parts)
+            )
+
+        if "host_name" in params:
+            suffix = params["host_name"].lower()
+            predicates.append(
+                lambda node: any(
+                    name.lower().endswith(suffix)
+                    for name in node.verified_host_names or ()
+                )
+            )
+
+        return predicates
+
+    @staticmethod
+    def _order(nodes: list, order: List[str]) -> list:
+        """
+        Sort `nodes` by each field of `order`, appending nodes without a value.
+        """
+        for field in reversed(order):
+            descending = field.startswith("-")
+            field = field.lstrip("-").lower()
+            present = [node for node in nodes if getattr(node, field, None) is not None]
+            missing = [node for node in nodes if getattr(node, field, None) is None]
+            present.sort(key=lambda node: getattr(node, field), reverse=descending)
+            nodes = present + missing
+        return nodes
+
+    @staticmethod
+    def _partial(cls: type, node, fields: Set[str]):
+        """
+        Copy of `node` restricted to `fields`.
+        """
+        names = {"as_" if field == "as" else field for field in fields}
+        return cls(
+            **{
+                field.name: getattr(node, field.name, None)
+                for field in dataclasses.fields(cls)
+                if field.name in names
+            }
+        )
@@ -0,0 +1,142 @@
+"""
+Implementation of :class:`RateLimit` and :class:`RateLimiter`.
+
+.. currentmodule:: garlic.ratelimit
+"""
+
+import dataclasses
+import time
+
+from typing import Optional
+
+import anyio
+
+
+@dataclasses.dataclass
+class RateLimit:
+    """
+    Bounds on the requests issued to the API.
+
+    Requests are paced by a token bucket holding up to `burst` tokens and
+    refilled at `rate` tokens per second, each request consuming a token.
+
+    :param rate: Sustained number of requests per second.
+        :class:`python:None` if unbounded.
+    :param burst: Number of requests which may be issued at once after a
+        quiet period. Defaults to one request, or to `rate` if greater.
+    :param max_concurrency: Maximum number of requests in flight.
+        :class:`python:None` if unbounded.
+    :raises ValueError: `rate`, `burst` or `max_concurrency` is not positive.
+    """
+
+    rate: Optional[float] = None
+    burst: Optional[int] = None
+    max_concurrency: Optional[int] = None
+
+    def __post_init__(self):
+        # written so NaN is rejected too.
+        if self.rate is not None and not self.rate > 0:
+            raise ValueError("rate must be positive")
+        if self.burst is not None and self.burst < 1:
+            raise ValueError("burst must be positive")
+        if self.max_concurrency is not None and self.max_concurrency < 1:
+            raise ValueError("max_concurrency must be positive")
+
+
+@dataclasses.dataclass
+class RateLimitStatistics:
+    """
+    Counters describing the behaviour of a :class:`RateLimiter`.
+
+    :param requests: Number of requests admitted.
+    :param delayed: Number of requests which waited to be admitted.
+    :param wait_time: Total duration (seconds) requests waited.
+    :param max_wait_time: Longest duration (seconds) a request waited.
+    :param waiting: Number of requests currently waiting.
+    :param in_flight: Number of requests currently admitted.
+    """
+
+    requests: int = 0
+    delayed: int = 0
+    wait_time: float = 0.0
+    max_wait_time: float = 0.0
+    waiting: int = 0
+    in_flight: int = 0
+
+
+class RateLimiter:
+    """
+    Admits requests according to a :class:`RateLimit`, in the order they
+    arrive.
+
+    Use as an asynchronous context manager around each request, the
+    concurrency slot is released on exit.
+    """
+
+    def __init__(self, limit: RateLimit):
+        """
+        :param limit: Bounds enforced by the limiter.
+        """
+        self.limit = limit
+        self.statistics = RateLimitStatistics()
+        self._capacity = max(1.0, float(limit.burst or limit.rate or 1))
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+        # created on first use, anyio primitives require a running event loop.
+        self._lock = None
+        self._semaphore = None
+
+    async def _take(self) -> None:
+        """
+        Consume a token, waiting for the bucket to refill if empty.
+        """
+        if self._lock is None:
+            self._lock = anyio.create_lock()
+
+        # requests queue on the lock, so tokens are handed out in order.
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self._capacity, self._tokens + (now - self._updated) * self.limit.rate
+            )
+            self._updated = now
+            if self._tokens < 1:
+                await anyio.sleep((1 - self._tokens) / self.limit.rate)
+                self._tokens, self._updated = 1.0, time.monotonic()
+            self._tokens -= 1
+
+    async def __aenter__(self):
+        started = time.monotonic()
+        self.statistics.waiting += 1
+        try:
+            if self.limit.max_concurrency is not None:
+                if self._semaphore is None:
+                    self._semaphore = anyio.create_semaphore(
+                        self.limit.max_concurrency
+                    )
+                await self._semaphore.__aenter__()
+            try:
+                if self.limit.rate is not None:
+                    await self._take()
+            except BaseException:
+                if self._semaphore is not None:
+                    await self._semaphore.__aexit__(None, None, None)
+                raise
+        finally:
+            self.statistics.waiting -= 1
+
+        waited = time.monotonic() - started
+        statistics = self.statistics
+        statistics.requests += 1
+        statistics.in_flight += 1
+        # scheduling alone takes a few microseconds.
+        if waited > 1e-3:
+            statistics.delayed += 1
+        statistics.wait_time += waited
+        statistics.max_wait_time = max(statistics.max_wait_time, waited)
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.statistics.in_flight -= 1
+        if self._semaphore is not None:
+            await self._semaphore.__aexit__(exc_type, exc_value, traceback)
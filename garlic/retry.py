@@ -0,0 +1,151 @@
+"""
+Implementation of :class:`RetryPolicy` and :class:`CircuitBreaker`.
+
+.. currentmodule:: garlic.retry
+"""
+
+import dataclasses
+import datetime as dt
+import email.utils
+import random
+import time
+
+from typing import FrozenSet, Optional
+
+
+@dataclasses.dataclass
+class RetryPolicy:
+    """
+    Policy deciding whether, and when, failed requests are retried.
+
+    The delay before each retry grows exponentially from `backoff` and is
+    drawn uniformly between zero and the computed delay if `jitter` is set,
+    so clients retrying together spread out. A `Retry-After` header sent by
+    the API extends the delay.
+
+    :param max_attempts: Maximum number of requests per resource.
+    :param backoff: Delay (seconds) before the first retry.
+    :param multiplier: Factor the delay grows by after each retry.
+    :param max_backoff: Upper bound (seconds) of the computed delay.
+    :param jitter: Randomise each delay between zero and the computed delay.
+    :param retry_statuses: HTTP status codes which are retried.
+    :param respect_retry_after: Wait at least the duration requested by the
+        `Retry-After` header.
+    :param deadline: Maximum duration (seconds) spent across all attempts.
+        :class:`python:None` if unbounded.
+    :param breaker_threshold: Number of consecutive failed requests, each
+        after exhausting its attempts, after which requests to the host are
+        rejected.
+    :param breaker_cooldown: Duration (seconds) requests to the host are
+        rejected for before a trial request is allowed.
+    """
+
+    max_attempts: int = 5
+    backoff: float = 0.5
+    multiplier: float = 2.0
+    max_backoff: float = 30.0
+    jitter: bool = True
+    retry_statuses: FrozenSet[int] = frozenset({500, 502, 503, 504})
+    respect_retry_after: bool = True
+    deadline: Optional[float] = None
+    breaker_threshold: int = 5
+    breaker_cooldown: float = 30.0
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Delay (seconds) before retrying.
+
+        :param attempt: Number of the failed attempt, starting at zero.
+        :param retry_after: Delay requested by the API.
+        """
+        delay = min(self.max_backoff, self.backoff * self.multiplier ** attempt)
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        if self.respect_retry_after and retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    @staticmethod
+    def parse_retry_after(value: Optional[str]) -> Optional[float]:
+        """
+        Parse a `Retry-After` header.
+
+        :param value: Header value, either a number of seconds or an HTTP
+            date.
+        :returns: Requested delay (seconds). :class:`python:None` if absent
+            or malformed.
+        """
+        if value is None:
+            return None
+
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+
+        try:
+            date = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=dt.timezone.utc)
+        return max(0.0, (date - dt.datetime.now(dt.timezone.utc)).total_seconds())
+
+
+class CircuitBreaker:
+    """
+    Rejects requests to a host after consecutive failures, allowing a single
+    trial request once the cooldown elapsed. A successful trial closes the
+    breaker, a failed trial restarts the cooldown.
+    """
+
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0):
+        """
+        :param threshold: Number of consecutive failures which open the
+            breaker.
+        :param cooldown: Duration (seconds) the breaker stays open.
+        """
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self._opened_at = None
+
+    @property
+    def open(self) -> bool:
+        """
+        Whether requests are currently rejected.
+        """
+        return (
+            self._opened_at is not None
+            and time.monotonic() - self._opened_at < self.cooldown
+        )
+
+    def allow(self) -> bool:
+        """
+        Whether a request may be issued, reserving the trial request if the
+        cooldown elapsed.
+        """
+        if self._opened_at is None:
+            return True
+        if self.open:
+            return False
+        # half-open, the cooldown restarts so further requests are rejected
+        # until this trial is recorded.
+        self._opened_at = time.monotonic()
+        return True
+
+    def record_success(self) -> None:
+        """
+        Record a successful request, closing the breaker.
+        """
+        self.failures = 0
+        self._opened_at = None
+
+    def record_failure(self) -> None:
+        """
+        Record a failed request, opening the breaker once the threshold is
+        reached.
+        """
+        self.failures += 1
+        if self.failures >= self.threshold:
+            self._opened_at = time.monotonic()
@@ -0,0 +1,268 @@
+"""
+Implementation of :class:`Snapshot`.
+
+.. currentmodule:: garlic.snapshot
+"""
+
+from typing import Dict, Iterable, Optional, Sequence, Tuple, Union
+
+from garlic.types import Flag, RelayDetailsBase, Response
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+#: Fields stored as dictionary-encoded strings.
+STRING_COLUMNS = (
+    "nickname",
+    "country",
+    "as_",
+    "as_name",
+    "platform",
+    "version",
+    "version_status",
+)
+
+#: Fields stored as `float64`, missing values are NaN.
+NUMERIC_COLUMNS = (
+    "consensus_weight",
+    "consensus_weight_fraction",
+    "guard_probability",
+    "middle_probability",
+    "exit_probability",
+    "bandwidth_rate",
+    "bandwidth_burst",
+    "observed_bandwidth",
+    "advertised_bandwidth",
+)
+
+
+def _encode(values: Sequence[Optional[str]]) -> Tuple["np.ndarray", Tuple[str, ...]]:
+    """
+    Dictionary-encode strings.
+
+    :param values: Strings, :class:`python:None` if missing.
+    :returns: Code of each string, -1 if missing, and the string of each code.
+    """
+    table = {}
+    codes = np.fromiter(
+        (
+            -1 if value is None else table.setdefault(value, len(table))
+            for value in values
+        ),
+        dtype=np.int32,
+        count=len(values),
+    )
+    return codes, tuple(table)
+
+
+class Snapshot:
+    """
+    Columnar representation of the relays of a details document.
+
+    Each field is stored as an array with an element per relay: strings as
+    `int32` codes into a table of distinct strings, flags as a `uint64`
+    bitmask and numbers as `float64`. Filters produce boolean masks, which
+    are combined with ``&``, ``|`` and ``~`` and accepted by the aggregates,
+    so queries over the whole network run without a Python loop per relay.
+
+    Requires NumPy, installed with the `numpy` extra.
+    """
+
+    def __init__(
+        self,
+        columns: Dict[str, "np.ndarray"],
+        categories: Dict[str, Tuple[str, ...]],
+    ):
+        """
+        Instantiate `Snapshot` object, see :meth:`from_relays` to build one
+        from descriptors.
+
+        :param columns: Array of each column, of equal length.
+        :param categories: Table of distinct strings of each string column,
+            and of the flag names under `flags`.
+        """
+        if np is None:
+            raise ImportError("Snapshot requires NumPy, install the numpy extra")
+
+        self.columns = columns
+        self.categories = categories
+
+    @classmethod
+    def from_relays(cls, relays: Iterable[RelayDetailsBase]) -> "Snapshot":
+        """
+        Instantiate from relay details.
+
+        :param relays: Relay details, fields which were not requested are
+            treated as missing.
+        """
+        if np is None:
+            raise ImportError("Snapshot requires NumPy, install the numpy extra")
+
+        relays = list(relays)
+        columns = {
+            "fingerprint": np.array(
+                [relay.fingerprint or "" for relay in relays], dtype="U40"
+            ),
+            "running": np.array([bool(relay.running) for relay in relays], dtype=bool),
+        }
+        categories = {}
+
+        for name in STRING_COLUMNS:
+            columns[name], categories[name] = _encode(
+                [getattr(relay, name, None) for relay in relays]
+            )
+        for name in NUMERIC_COLUMNS:
+            columns[name] = np.array(
+                [getattr(relay, name, None) for relay in relays], dtype=np.float64
+            )
+
+        bits = {}
+        masks = []
+        for relay in relays:
+            mask = 0
+            for flag in relay.flags or ():
+                mask |= 1 << bits.setdefault(flag, len(bits))
+            masks.append(mask)
+        if len(bits) > 64:
+            raise ValueError("more than 64 distinct flags")
+        columns["flags"] = np.array(masks, dtype=np.uint64)
+        categories["flags"] = tuple(bits)
+
+        return cls(columns, categories)
+
+    @classmethod
+    def from_response(cls, response: Response) -> "Snapshot":
+        """
+        Instantiate from the relays of a details document.
+
+        :param response: Details document.
+        """
+        return cls.from_relays(response.relays)
+
+    def __len__(self) -> int:
+        return len(self.columns["fingerprint"])
+
+    def __getitem__(self, name: str) -> "np.ndarray":
+        """
+        Array of column `name`, codes for string columns.
+        """
+        return self.columns[name]
+
+    def decode(self, name: str) -> "np.ndarray":
+        """
+        Strings of string column `name`, :class:`python:None` if missing.
+
+        :param name: String column.
+        """
+        table = np.array(self.categories[name] + (None,), dtype=object)
+        return table[self.columns[name]]
+
+    def equals(self, name: str, value: Optional[str]) -> "np.ndarray":
+        """
+        Mask of the relays whose string column `name` is `value`.
+
+        :param name: String column.
+        :param value: String, :class:`python:None` to select missing values.
+        """
+        try:
+            code = -1 if value is None else self.categories[name].index(value)
+        except ValueError:
+            return np.zeros(len(self), dtype=bool)
+        return self.columns[name] == code
+
+    def isin(self, name: str, values: Iterable[Optional[str]]) -> "np.ndarray":
+        """
+        Mask of the relays whose string column `name` is any of `values`.
+
+        :param name: String column.
+        :param values: Strings, :class:`python:None` to select missing values.
+        """
+        table = self.categories[name]
+        codes = [
+            -1 if value is None else table.index(value)
+            for value in values
+            if value is None or value in table
+        ]
+        return np.isin(self.columns[name], codes)
+
+    def has_flag(self, flag: Union[Flag, str]) -> "np.ndarray":
+        """
+        Mask of the relays assigned `flag`.
+
+        :param flag: Relay flag.
+        """
+        name = flag.value if isinstance(flag, Flag) else flag
+        try:
+            bit = np.uint64(1 << self.categories["flags"].index(name))
+        except ValueError:
+            return np.zeros(len(self), dtype=bool)
+        return (self.columns["flags"] & bit) != 0
+
+    def filter(self, mask: "np.ndarray") -> "Snapshot":
+        """
+        Snapshot of the relays selected by `mask`, sharing the string tables.
+
+        :param mask: Boolean mask or array of indices.
+        """
+        return Snapshot(
+            {name: column[mask] for name, column in self.columns.items()},
+            self.categories,
+        )
+
+    def sum(self, name: str, mask: Optional["np.ndarray"] = None) -> float:
+        """
+        Sum of numeric column `name`, ignoring missing values.
+
+        :param name: Numeric column.
+        :param mask: Relays to include, all if :class:`python:None`.
+        """
+        column = self.columns[name]
+        if mask is not None:
+            column = column[mask]
+        return float(np.nansum(column))
+
+    def groupby(
+        self,
+        key: str,
+        value: Optional[str] = None,
+        mask: Optional["np.ndarray"] = None,
+    ) -> Dict[Optional[str], float]:
+        """
+        Aggregate relays by the string of column `key`.
+
+        :param key: String column, or `flags` to aggregate the relays of each
+            flag.
+        :param value: Numeric column summed per group, missing values are
+            ignored. Relays are counted if :class:`python:None`.
+        :param mask: Relays to include, all if :class:`python:None`.
+        :returns: Aggregate of each group with at least one relay, keyed by
+            string. Relays missing `key` are grouped under
+            :class:`python:None`.
+        """
+        weights = None
+        if value is not None:
+            weights = np.nan_to_num(self.columns[value], nan=0.0)
+
+        keys = self.columns[key]
+        if mask is not None:
+            keys = keys[mask]
+            weights = None if weights is None else weights[mask]
+
+        if key == "flags":
+            groups = {}
+            for index, flag in enumerate(self.categories["flags"]):
+                selected = (keys & np.uint64(1 << index)) != 0
+                if selected.any():
+                    groups[flag] = float(
+                        selected.sum() if weights is None else weights[selected].sum()
+                    )
+            return groups
+
+        table = self.categories[key] + (None,)
+        # missing values are counted in the last bin.
+        keys = np.where(keys < 0, len(table) - 1, keys)
+        totals = np.bincount(keys, weights=weights, minlength=len(table))
+        counts = totals if weights is None else np.bincount(keys, minlength=len(table))
+        return {table[code]: float(totals[code]) for code in np.flatnonzero(counts)}
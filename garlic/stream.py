@@ -0,0 +1,157 @@
+"""
+Implementation of :class:`DocumentDecoder`.
+
+.. currentmodule:: garlic.stream
+"""
+
+import json
+import re
+
+from typing import Iterable, List, Optional, Tuple
+
+_WHITESPACE = re.compile(r"[\s,]*")
+_SEPARATOR = re.compile(r"\s*(:)?")
+# complete strings (or the unterminated remainder of the buffer) and brackets.
+_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*(?:"|\\?\Z)|[{}\[\]]')
+_SCALAR_END = re.compile(r"[\s,}\]]")
+
+_START, _KEY, _VALUE, _ARRAY, _DONE = range(5)
+
+
+class DocumentDecoder:
+    """
+    Incremental decoder of API documents.
+
+    Text is fed to the decoder as it is received, each element of the
+    `relays` and `bridges` arrays is returned as soon as it is complete, and
+    the remaining top-level fields are collected in :attr:`fields`. Only the
+    elements which are incomplete are retained between calls.
+    """
+
+    def __init__(self, arrays: Iterable[str] = ("relays", "bridges")):
+        """
+        :param arrays: Top-level fields whose elements are decoded
+            individually.
+        """
+        self.arrays = frozenset(arrays)
+        self.fields = {}
+        self._buffer = ""
+        self._state = _START
+        self._key = None
+
+    @property
+    def complete(self) -> bool:
+        """
+        Whether the whole document was decoded.
+        """
+        return self._state == _DONE
+
+    def feed(self, text: str) -> List[Tuple[str, dict]]:
+        """
+        Decode the next part of the document.
+
+        :param text: Text following the previously fed text.
+        :returns: Array elements completed by `text`, as tuples of the array
+            name and the element.
+        """
+        self._buffer += text
+        buffer = self._buffer
+        elements = []
+        pos = 0
+
+        while True:
+            pos = _WHITESPACE.match(buffer, pos).end()
+            if pos == len(buffer) or self._state == _DONE:
+                break
+
+            if self._state == _START:
+                if buffer[pos] != "{":
+                    raise ValueError(f"expected object at position {pos}")
+                self._state = _KEY
+                pos += 1
+
+            elif self._state == _KEY:
+                if buffer[pos] == "}":
+                    self._state = _DONE
+                    pos += 1
+                    continue
+
+                end = self._scan(buffer, pos)
+                if end is None:
+                    break
+                separator = _SEPARATOR.match(buffer, end)
+                if separator.group(1) is None:
+                    if separator.end() == len(buffer):
+                        break
+                    raise ValueError(f"expected separator at position {end}")
+                self._key = json.loads(buffer[pos:end])
+                self._state = _VALUE
+                pos = separator.end()
+
+            elif self._state == _VALUE:
+                if self._key in self.arrays:
+                    if buffer[pos] != "[":
+                        raise ValueError(f"expected array at position {pos}")
+                    self._state = _ARRAY
+                    pos += 1
+                    continue
+
+                end = self._scan(buffer, pos)
+                if end is None:
+                    break
+                self.fields[self._key] = json.loads(buffer[pos:end])
+                self._state = _KEY
+                pos = end
+
+            elif self._state == _ARRAY:
+                if buffer[pos] == "]":
+                    self._state = _KEY
+                    pos += 1
+                    continue
+
+                end = self._scan(buffer, pos)
+                if end is None:
+                    break
+                elements.append((self._key, json.loads(buffer[pos:end])))
+                pos = end
+
+        self._buffer = buffer[pos:]
+        return elements
+
+    def close(self) -> None:
+        """
+        Ensure the whole document was decoded.
+
+        :raises ValueError: The document is truncated.
+        """
+        if not self.complete or self._buffer.strip():
+            raise ValueError("document is truncated")
+
+    @staticmethod
+    def _scan(buffer: str, pos: int) -> Optional[int]:
+        """
+        Find the end of the JSON value starting at `pos`.
+
+        :returns: Position following the value. :class:`python:None` if the
+            value is incomplete.
+        """
+        if buffer[pos] not in '{["':
+            match = _SCALAR_END.search(buffer, pos)
+            return None if match is None else match.start()
+
+        depth = 0
+        for match in _TOKEN.finditer(buffer, pos):
+            token = match.group()
+            if token[0] == '"':
+                if match.end() == len(buffer) and (
+                    len(token) == 1 or token[-1] != '"' or token.endswith('\\"')
+                ):
+                    return None
+            elif token in "{[":
+                depth += 1
+            else:
+                depth -= 1
+
+            if depth == 0:
+                return match.end()
+        return None
@@ -4,21 +4,38 @@ Implementation of types utilised internally and externally.
 .. currentmodule:: garlic.types
 
 .. py:data:: RelayDescriptor
-   :value: Union[RelaySummary, PartialRelayDetails, RelayDetails, RelayBandwidth, RelayWeight, RelayUptime]
+   :value: Union[RelaySummary, PartialRelayDetails, RelayDetails, LazyRelayDetails, RelayBandwidth, RelayWeight, RelayUptime]
 
 .. py:data:: BridgeDescriptor
    :value: Union[BridgeSummary, PartialBridgeDetails, BridgeDetails, BridgeBandwidth, BridgeClients, BridgeUptime]
 """
 
+import bisect
 import datetime as dt
+import math
 
 from abc import ABC, abstractclassmethod
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from enum import Enum
-from typing import List, TypeVar, Union, Dict, Optional, NewType, Set
+from typing import (
+    List,
+    TypeVar,
+    Union,
+    Dict,
+    Optional,
+    NewType,
+    Iterable,
+    Iterator,
+    Tuple,
+)
 
 from garlic import utils
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 
 class Deserialisable(ABC):
     """
@@ -26,6 +43,8 @@ class Deserialisable(ABC):
     objects.
     """
 
+    __slots__ = ()
+
     @abstractclassmethod
     def from_json(cls, json: dict):
         """
@@ -60,26 +79,166 @@ class Flag(Enum):
     VALID = "Valid"
 
 
+class PortRanges:
+    """
+    Set of ports stored as sorted, disjoint and inclusive ranges.
+
+    Membership is tested with a binary search over the ranges, so neither
+    memory nor lookup cost depends on the number of ports covered.
+    """
+
+    __slots__ = ("ranges", "_starts")
+
+    MAX_PORT = 65535
+
+    def __init__(self, ranges: Iterable[Tuple[int, int]] = ()):
+        """
+        Instantiate `PortRanges` object.
+
+        :param ranges: Inclusive `(first, last)` port ranges, which may overlap
+            or be unordered.
+        """
+        merged = []
+        for first, last in sorted(ranges):
+            if first > last:
+                raise ValueError(f"invalid port range {first}-{last}")
+            if merged and first <= merged[-1][1] + 1:
+                if last > merged[-1][1]:
+                    merged[-1] = (merged[-1][0], last)
+            else:
+                merged.append((first, last))
+
+        self.ranges = tuple(merged)
+        self._starts = [first for first, _ in merged]
+
+    @classmethod
+    def from_ports(cls, ports: Iterable[int]) -> "PortRanges":
+        """
+        Instantiate from individual ports.
+
+        :param ports: Ports to include.
+        """
+        return cls((port, port) for port in ports)
+
+    @classmethod
+    def from_json(cls, json: List[str]) -> "PortRanges":
+        """
+        Instantiate from port ranges as formatted by the API, such as
+        `["22", "80-443"]`.
+
+        :param json: Array of ports or ranges of ports.
+        """
+        ranges = []
+        for entry in json:
+            first, _, last = entry.partition("-")
+            ranges.append((int(first), int(last or first)))
+        return cls(ranges)
+
+    def to_json(self) -> List[str]:
+        """
+        Serialise into port ranges as formatted by the API.
+        """
+        return [
+            str(first) if first == last else f"{first}-{last}"
+            for first, last in self.ranges
+        ]
+
+    def __contains__(self, port: int) -> bool:
+        index = bisect.bisect_right(self._starts, port) - 1
+        return index >= 0 and port <= self.ranges[index][1]
+
+    def __iter__(self) -> Iterator[int]:
+        for first, last in self.ranges:
+            yield from range(first, last + 1)
+
+    def __len__(self) -> int:
+        return sum(last - first + 1 for first, last in self.ranges)
+
+    def __bool__(self) -> bool:
+        return bool(self.ranges)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, PortRanges):
+            return NotImplemented
+        return self.ranges == other.ranges
+
+    def __hash__(self) -> int:
+        return hash(self.ranges)
+
+    def __or__(self, other: "PortRanges") -> "PortRanges":
+        return PortRanges(self.ranges + other.ranges)
+
+    def __and__(self, other: "PortRanges") -> "PortRanges":
+        ranges, i, j = [], 0, 0
+        while i < len(self.ranges) and j < len(other.ranges):
+            first = max(self.ranges[i][0], other.ranges[j][0])
+            last = min(self.ranges[i][1], other.ranges[j][1])
+            if first <= last:
+                ranges.append((first, last))
+            if self.ranges[i][1] < other.ranges[j][1]:
+                i += 1
+            else:
+                j += 1
+        return PortRanges(ranges)
+
+    def __invert__(self) -> "PortRanges":
+        ranges, first = [], 1
+        for start, last in self.ranges:
+            if first < start:
+                ranges.append((first, start - 1))
+            first = last + 1
+        if first <= self.MAX_PORT:
+            ranges.append((first, self.MAX_PORT))
+        return PortRanges(ranges)
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({','.join(self.to_json())})"
+
+
 class ExitPolicy:
     """
     Representation of exit policy summaries.
+
+    The API summarises a policy either by the ports it accepts or by the
+    ports it rejects, `port in policy` tests whether exiting to `port` is
+    permitted in either case.
     """
 
-    def __init__(self, accept_policy: Set[int] = None, reject_policy: Set[int] = None):
+    __slots__ = ("accept_policy", "reject_policy", "ports")
+
+    def __init__(
+        self,
+        accept_policy: Union[PortRanges, Iterable[int]] = None,
+        reject_policy: Union[PortRanges, Iterable[int]] = None,
+    ):
         """
         Instantiate `ExitPolicy` object.
 
         :param accept_policy: Range of ports to accept.
         :param reject_policy: Range of ports to reject.
         """
-        if accept_policy is None:
-            accept_policy = set()
 
-        if reject_policy is None:
-            reject_policy = set()
+        def _ranges(policy):
+            if policy is None:
+                return PortRanges()
+            if isinstance(policy, PortRanges):
+                return policy
+            return PortRanges.from_ports(policy)
+
+        self.accept_policy = _ranges(accept_policy)
+        self.reject_policy = _ranges(reject_policy)
 
-        self.accept_policy = accept_policy
-        self.reject_poilcy = reject_policy
+        if self.accept_policy or not self.reject_policy:
+            self.ports = self.accept_policy
+        else:
+            self.ports = ~self.reject_policy
+
+    @property
+    def reject_poilcy(self) -> PortRanges:
+        """
+        Misspelt alias of :attr:`reject_policy`, kept for compatibility.
+        """
+        return self.reject_policy
 
     @classmethod
     def from_json(cls, json: dict):
@@ -88,31 +247,52 @@ class ExitPolicy:
 
         :param json: Raw JSON response.
         """
-
-        def _parse_policy(policy):
-            port_range = set()
-            for entry in policy:
-                chunks = [int(chunk) for chunk in entry.split("-") if chunk]
-                if len(chunks) == 1:
-                    port_range.add(chunks[0])
-                else:
-                    port_range.update(set(range(chunks[0], chunks[1])))
-            return port_range
-
         accept_policy = None
         reject_policy = None
 
         if (array := json.get("accept")) :
-            accept_policy = _parse_policy(array)
+            accept_policy = PortRanges.from_json(array)
         if (array := json.get("reject")) :
-            reject_policy = _parse_policy(array)
+            reject_policy = PortRanges.from_json(array)
 
         return cls(accept_policy, reject_policy)
 
+    def to_json(self) -> dict:
+        """
+        Serialise into an exit policy summary as formatted by the API.
+        """
+        if self.reject_policy and not self.accept_policy:
+            return {"reject": self.reject_policy.to_json()}
+        return {"accept": self.accept_policy.to_json()}
+
+    def __contains__(self, port: int) -> bool:
+        return port in self.ports
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ExitPolicy):
+            return NotImplemented
+        return self.ports == other.ports
+
+    def __hash__(self) -> int:
+        return hash(self.ports)
+
+    def __or__(self, other: "ExitPolicy") -> "ExitPolicy":
+        """
+        Policy permitting the ports permitted by either policy.
+        """
+        return ExitPolicy(accept_policy=self.ports | other.ports)
+
+    def __and__(self, other: "ExitPolicy") -> "ExitPolicy":
+        """
+        Policy permitting the ports permitted by both policies.
+        """
+        return ExitPolicy(accept_policy=self.ports & other.ports)
+
     def __repr__(self):
-        return self.__class__.__name__
+        return f"{self.__class__.__name__}({self.to_json()})"
 
 
+@utils.slotted
 @dataclass
 class RelaySummary(Deserialisable):
     """
@@ -152,6 +332,7 @@ class RelaySummary(Deserialisable):
         )
 
 
+@utils.slotted
 @dataclass
 class BridgeSummary(Deserialisable):
     """
@@ -176,7 +357,6 @@ class BridgeSummary(Deserialisable):
 
         :param json: Raw JSON response.
         """
-        print(json)
         return cls(nickname=json["n"], hashed_fingerprint=json["h"], running=json["r"])
 
 
@@ -357,6 +537,8 @@ class RelayDetailsBase(Deserialisable):
         lower-case. :class:`py:None` if empty.
     """
 
+    __slots__ = ()
+
     nickname: None
     fingerprint: None
     or_addresses: None
@@ -395,7 +577,7 @@ class RelayDetailsBase(Deserialisable):
     effective_family: Optional[List[str]] = None
     alleged_family: Optional[List[str]] = None
     indirect_family: Optional[List[str]] = None
-    consensus_weight_fraction: Optional[int] = None
+    consensus_weight_fraction: Optional[float] = None
     guard_probability: Optional[float] = None
     middle_probability: Optional[float] = None
     exit_probability: Optional[float] = None
@@ -403,6 +585,35 @@ class RelayDetailsBase(Deserialisable):
     unreachable_or_addresses: Optional[List[str]] = None
 
 
+_RELAY_DETAILS_FIELDS = frozenset(field.name for field in fields(RelayDetailsBase))
+
+# fields of the relay details document which are not stored as received.
+_RELAY_DETAILS_DECODERS = {
+    "last_seen": utils.decode_utc,
+    "last_changed_address_or_port": utils.decode_utc,
+    "first_seen": utils.decode_utc,
+    "last_restarted": utils.decode_utc,
+    "exit_policy_summary": ExitPolicy.from_json,
+    "exit_policy_v6_summary": ExitPolicy.from_json,
+}
+
+
+def _decode_relay_details(json: dict) -> dict:
+    """
+    Decode the fields of a relay details document, in place.
+
+    :param json: Raw JSON response.
+    :returns: `json`, keyed by field name.
+    """
+    if "as" in json:
+        json["as_"] = json.pop("as")
+    for field, decode in _RELAY_DETAILS_DECODERS.items():
+        if json.get(field) is not None:
+            json[field] = decode(json[field])
+    return json
+
+
+@utils.slotted
 @dataclass
 class RelayDetails(RelayDetailsBase):
     """
@@ -445,22 +656,10 @@ class RelayDetails(RelayDetailsBase):
 
         :param json: Raw JSON response.
         """
-        json["as_"] = json.pop("as", None)
-        json["last_seen"] = utils.decode_utc(json.pop("last_seen"))
-        json["last_changed_address_or_port"] = utils.decode_utc(
-            json.pop("last_changed_address_or_port")
-        )
-        json["first_seen"] = utils.decode_utc(json.pop("first_seen"))
-        json["last_restarted"] = utils.decode_utc(json.pop("last_restarted"))
-        json["exit_policy_summary"] = ExitPolicy.from_json(
-            json.pop("exit_policy_summary")
-        )
-        json["exit_policy_v6_summary"] = ExitPolicy.from_json(
-            json.pop("exit_policy_v6_summary")
-        )
-        return cls(**json)
+        return cls(**_decode_relay_details(json))
 
 
+@utils.slotted
 @dataclass
 class PartialRelayDetails(RelayDetailsBase):
     """
@@ -500,27 +699,49 @@ class PartialRelayDetails(RelayDetailsBase):
 
         :param json: Raw JSON response.
         """
-        if "as_" in json:
-            json["as_"] = json.pop("as", None)
-        if "last_seen" in json:
-            json["last_seen"] = utils.decode_utc(json.pop("last_seen"))
-        if "last_changed_address_or_port" in json:
-            json["last_changed_address_or_port"] = utils.decode_utc(
-                json.pop("last_changed_address_or_port")
-            )
-        if "last_seen" in json:
-            json["first_seen"] = utils.decode_utc(json.pop("first_seen"))
-        if "last_restarted" in json:
-            json["last_restarted"] = utils.decode_utc(json.pop("last_restarted"))
-        if "exit_policy_summary" in json:
-            json["exit_policy_summary"] = ExitPolicy.from_json(
-                json.pop("exit_policy_summary")
-            )
-        if "exit_policy_v6_summary" in json:
-            json["exit_policy_v6_summary"] = ExitPolicy.from_json(
-                json.pop("exit_policy_v6_summary")
+        return cls(**_decode_relay_details(json))
+
+
+class LazyRelayDetails(RelayDetailsBase):
+    """
+    :class:`RelayDetailsBase` specialisation which retains the JSON response
+    and decodes each field on first access, storing the decoded value for
+    subsequent accesses. Fields absent from the response are
+    :class:`python:None`.
+
+    Accessing a few fields of each relay therefore skips decoding the
+    timestamps and exit policies of the others.
+    """
+
+    __slots__ = ("_json",) + tuple(sorted(_RELAY_DETAILS_FIELDS))
+
+    def __init__(self, json: dict):
+        """
+        :param json: Raw JSON response.
+        """
+        self._json = json
+
+    @classmethod
+    def from_json(cls, json: dict):
+        """
+        Instantiate a relay details document with JSON response from the API.
+
+        :param json: Raw JSON response.
+        """
+        return cls(json)
+
+    def __getattr__(self, name: str):
+        # only called for fields which were not yet decoded.
+        if name not in _RELAY_DETAILS_FIELDS:
+            raise AttributeError(
+                f"'{self.__class__.__name__}' object has no attribute '{name}'"
             )
-        return cls(**json)
+
+        value = self._json.get("as" if name == "as_" else name)
+        if value is not None and (decode := _RELAY_DETAILS_DECODERS.get(name)):
+            value = decode(value)
+        setattr(self, name, value)
+        return value
 
 
 @dataclass
@@ -585,6 +806,8 @@ class BridgeDetailsBase(Deserialisable):
         currently assigned to.
     """
 
+    __slots__ = ()
+
     nickname: str
     hashed_fingerprint: str
     or_addresses: List[str]
@@ -599,7 +822,7 @@ class BridgeDetailsBase(Deserialisable):
     recommended_version: Optional[bool] = None
     version_status: Optional[str] = None
     transports: Optional[List[str]] = None
-    bridgedb_distribtor: Optional[str] = None
+    bridgedb_distributor: Optional[str] = None
 
     @classmethod
     def from_json(cls, json: dict):
@@ -615,6 +838,7 @@ class BridgeDetailsBase(Deserialisable):
         return cls(**json)
 
 
+@utils.slotted
 @dataclass
 class PartialBridgeDetails:
     """
@@ -644,25 +868,36 @@ class PartialBridgeDetails:
         return cls(**json)
 
 
+@utils.slotted
 @dataclass
-class BridgeDetails:
+class BridgeDetails(BridgeDetailsBase):
     """
-    Representation of the `bridge details document <https://metrics.torproject.org/onionoo.html#details_bridge>`_
-    where only specific fields had been requested.
+    :class:`BridgeDetailsBase` specialisation where all fields had been
+    requested.
     """
 
-    nickname: str
-    hashed_fingerprint: str
-    or_addresses: str
-    last_seen: dt.datetime
-    first_seen: dt.datetime
-
 
 class GraphHistory(Deserialisable):
     """
     Representation of the `graph history document <https://metrics.torproject.org/onionoo.html#history_graph>`_.
+
+    If NumPy is installed, for instance with the `numpy` extra, `values` is
+    converted once into an array of `float64` with NaN in place of null
+    values, and :meth:`to_array` and :attr:`timestamps` return arrays.
+    Otherwise they are lists.
     """
 
+    __slots__ = (
+        "first",
+        "last",
+        "interval",
+        "factor",
+        "values",
+        "count",
+        "_array",
+        "_timestamps",
+    )
+
     def __init__(
         self,
         first: dt.datetime,
@@ -687,15 +922,77 @@ class GraphHistory(Deserialisable):
         self.last = last
         self.interval = interval
         self.factor = factor
-        self.values = values
+        self.values = values if np is None else np.array(values, dtype=np.float64)
         self.count = count
+        self._array = None
+        self._timestamps = None
 
     def denormalise(self) -> None:
         """
         Denormalise values, in place, by multiplyling each value by
-        :py:attr:`self.factor`.
+        :py:attr:`self.factor`, which is then reset to 1 so the values are not
+        scaled again. Null values are retained.
+
+        >>> history = GraphHistory(
+        ...     dt.datetime(2020, 1, 1), dt.datetime(2020, 1, 1, 1),
+        ...     dt.timedelta(hours=1), 0.5, [2, 4],
+        ... )
+        >>> history.denormalise()
+        >>> [float(value) for value in history.to_array()]
+        [1.0, 2.0]
+        """
+        if np is not None:
+            self.values *= self.factor
+        else:
+            self.values = [
+                None if value is None else value * self.factor
+                for value in self.values
+            ]
+        self.factor = 1
+        self._array = None
+
+    def to_array(self, denormalise: bool = True):
         """
-        self.values = [value * self.factor for value in self.values]
+        Values as floating point numbers, with NaN in place of null values.
+
+        With NumPy, the array is computed once and shared with the history,
+        so it must not be modified.
+
+        :param denormalise: Multiply each value by :py:attr:`self.factor`,
+            which is 1 once :meth:`denormalise` was called.
+        :returns: :class:`numpy.ndarray` of `float64` if NumPy is installed,
+            otherwise a list.
+        """
+        factor = self.factor if denormalise else 1
+        if np is None:
+            return [
+                math.nan if value is None else value * factor for value in self.values
+            ]
+        if factor == 1:
+            return self.values
+        if self._array is None:
+            self._array = self.values * factor
+        return self._array
+
+    @property
+    def timestamps(self):
+        """
+        UTC timestamp of the interval midpoint of each value, computed once.
+
+        :returns: :class:`numpy.ndarray` of `datetime64[s]` if NumPy is
+            installed, otherwise a list of :class:`python:datetime.datetime`.
+        """
+        if self._timestamps is None:
+            if np is not None:
+                self._timestamps = np.datetime64(self.first, "s") + np.arange(
+                    len(self.values)
+                ) * np.timedelta64(int(self.interval.total_seconds()), "s")
+            else:
+                self._timestamps = [
+                    self.first + index * self.interval
+                    for index in range(len(self.values))
+                ]
+        return self._timestamps
 
     @classmethod
     def from_json(cls, json: dict):
@@ -711,8 +1008,30 @@ class GraphHistory(Deserialisable):
         obj = GraphHistory(**json)
         return obj
 
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, GraphHistory):
+            return NotImplemented
+        if np is not None:
+            same = np.array_equal(self.values, other.values, equal_nan=True)
+        else:
+            same = self.values == other.values
+        return same and (
+            self.first,
+            self.last,
+            self.interval,
+            self.factor,
+            self.count,
+        ) == (other.first, other.last, other.interval, other.factor, other.count)
+
+    # histories are mutable, see :meth:`denormalise`.
+    __hash__ = None
+
     def __repr__(self):
-        return "{0.__class__.__name__}<{0.__dict__}>".format(self)
+        attributes = utils.attributes(self)
+        if np is not None:
+            # NumPy abbreviates large arrays and rounds their values.
+            attributes["values"] = self.values.tolist()
+        return "{0.__class__.__name__}<{1}>".format(self, attributes)
 
 
 IntervaledHistory = Dict[str, GraphHistory]
@@ -732,6 +1051,8 @@ class BandwidthBase(Deserialisable):
     Representation of the `bandwidth document <https://metrics.torproject.org/onionoo.html#bandwidth>`_.
     """
 
+    __slots__ = ("fingerprint", "write_history", "read_history")
+
     def __init__(
         self,
         fingerprint: str,
@@ -743,7 +1064,7 @@ class BandwidthBase(Deserialisable):
         self.read_history = read_history
 
     def __repr__(self):
-        return "{0.__class__.__name__}<{0.__dict__}>".format(self)
+        return "{0.__class__.__name__}<{1}>".format(self, utils.attributes(self))
 
 
 class RelayBandwidth(BandwidthBase):
@@ -760,6 +1081,8 @@ class RelayBandwidth(BandwidthBase):
         histories on the required level of detail.
     """
 
+    __slots__ = ()
+
     @classmethod
     def from_json(cls, json: dict):
         """
@@ -791,6 +1114,8 @@ class BridgeBandwidth(BandwidthBase):
         on the required level of detail.
     """
 
+    __slots__ = ()
+
     @classmethod
     def from_json(cls, json: dict):
         """
@@ -814,6 +1139,15 @@ class RelayWeight(Deserialisable):
     Representation of the `relay weight document <https://metrics.torproject.org/onionoo.html#weights_relay>`_.
     """
 
+    __slots__ = (
+        "fingerprint",
+        "consensus_weight_fraction",
+        "guard_probability",
+        "middle_probability",
+        "exit_probability",
+        "consensus_weight",
+    )
+
     def __init__(
         self,
         fingerprint: str,
@@ -870,7 +1204,7 @@ class RelayWeight(Deserialisable):
         )
 
     def __repr__(self):
-        return "{0.__class__.__name__}<{0.__dict__}>".format(self)
+        return "{0.__class__.__name__}<{1}>".format(self, utils.attributes(self))
 
 
 class BridgeClients(Deserialisable):
@@ -878,6 +1212,8 @@ class BridgeClients(Deserialisable):
     Representation of the `bridge clients document <https://metrics.torproject.org/onionoo.html#clients_bridge>`_.
     """
 
+    __slots__ = ("fingerprint", "average_clients")
+
     def __init__(
         self, fingerprint: str, average_clients: Optional[IntervaledHistory] = None
     ):
@@ -902,6 +1238,8 @@ class BridgeClients(Deserialisable):
         return cls(fingerprint=json["fingerprint"], average_clients=average_clients)
 
 
+@utils.slotted
+@dataclass
 class RelayUptime(Deserialisable):
     """
     Representation of the `relay uptime document <https://metrics.torproject.org/onionoo.html#uptime_relay>`_.
@@ -914,7 +1252,7 @@ class RelayUptime(Deserialisable):
 
     fingerprint: str
     uptime: Optional[IntervaledHistory] = None
-    flags: Optional[List[Flag]] = None
+    flags: Optional[Dict[Flag, IntervaledHistory]] = None
 
     @classmethod
     def from_json(cls, json: dict):
@@ -933,9 +1271,10 @@ class RelayUptime(Deserialisable):
         return cls(fingerprint=json["fingerprint"], uptime=uptime, flags=flags)
 
     def __repr__(self):
-        return "{0.__class__.__name__}<{0.__dict__}>".format(self)
+        return "{0.__class__.__name__}<{1}>".format(self, utils.attributes(self))
 
 
+@utils.slotted
 @dataclass
 class BridgeUptime(Deserialisable):
     """
@@ -962,13 +1301,14 @@ class BridgeUptime(Deserialisable):
         return cls(fingerprint=json["fingerprint"], uptime=uptime)
 
     def __repr__(self):
-        return "{0.__class__.__name__}<{0.__dict__}>".format(self)
+        return "{0.__class__.__name__}<{1}>".format(self, utils.attributes(self))
 
 
 RelayDescriptor = Union[
     RelaySummary,
     PartialRelayDetails,
     RelayDetails,
+    LazyRelayDetails,
     RelayBandwidth,
     RelayWeight,
     RelayUptime,
@@ -6,14 +6,100 @@ Utility definitions/functions.
 .. py:data:: UTC_FORMAT
    :value: "%Y-%m-%d %H:%M:%S"
 """
+import dataclasses
 import datetime as dt
+import functools
+import hashlib
 
 UTC_FORMAT = "%Y-%m-%d %H:%M:%S"
 
+
+@functools.lru_cache(maxsize=4096)
 def decode_utc(timestamp: str) -> dt.datetime:
     """
     Decode UTC timestamp.
 
+    Timestamps in :data:`UTC_FORMAT` are decoded by
+    :meth:`python:datetime.datetime.fromisoformat`, which is considerably
+    faster than :meth:`python:datetime.datetime.strptime`, and recently
+    decoded timestamps are memoised since documents repeat them for every
+    descriptor.
+
     :param timestamp: UTC timestamp.
     """
+    # fromisoformat accepts other shapes, such as UTC offsets, which strptime
+    # rejects.
+    if (
+        len(timestamp) == 19
+        and timestamp[10] == " "
+        and timestamp[4] == timestamp[7] == "-"
+        and timestamp[13] == timestamp[16] == ":"
+    ):
+        try:
+            decoded = dt.datetime.fromisoformat(timestamp)
+        except ValueError:
+            pass
+        else:
+            if decoded.tzinfo is None:
+                return decoded
+    # reports malformed timestamps consistently.
     return dt.datetime.strptime(timestamp, UTC_FORMAT)
+
+
+def hash_fingerprint(fingerprint: str) -> str:
+    """
+    Hashed fingerprint of a relay, by which the API looks it up too.
+
+    :param fingerprint: Relay fingerprint of 40 hexadecimal characters.
+    :returns: SHA-1 hash of the fingerprint, of 40 upper-case hexadecimal
+        characters.
+    """
+    return hashlib.sha1(bytes.fromhex(fingerprint)).hexdigest().upper()
+
+
+def slotted(cls: type) -> type:
+    """
+    Recreate dataclass `cls` with `__slots__` declaring each of its fields
+    which is not already declared by a base class, so instances are stored
+    without a per-instance `__dict__`.
+
+    Bases must declare `__slots__` too, and must not declare fields as slots
+    if subclasses redeclare them.
+
+    :param cls: Dataclass to recreate.
+    """
+    inherited = set()
+    for base in cls.__mro__[1:]:
+        inherited.update(getattr(base, "__slots__", ()))
+
+    names = tuple(
+        field.name for field in dataclasses.fields(cls) if field.name not in inherited
+    )
+    # field defaults are class attributes, which conflict with slots.
+    namespace = {
+        key: value
+        for key, value in cls.__dict__.items()
+        if key not in names and key not in ("__dict__", "__weakref__")
+    }
+    namespace["__slots__"] = names
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+
+def attributes(obj: object) -> dict:
+    """
+    Public attributes of `obj`, whether stored in `__slots__` or `__dict__`.
+
+    :param obj: Object to enumerate.
+    """
+    values = {}
+    for cls in reversed(type(obj).__mro__):
+        slots = cls.__dict__.get("__slots__", ())
+        for name in (slots,) if isinstance(slots, str) else slots:
+            if not name.startswith("_") and hasattr(obj, name):
+                values[name] = getattr(obj, name)
+    values.update(
+        (name, value)
+        for name, value in getattr(obj, "__dict__", {}).items()
+        if not name.startswith("_")
+    )
+    return values
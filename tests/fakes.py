@@ -0,0 +1,82 @@
+"""
+Fake :class:`asks.Session` answering requests with scripted responses.
+"""
+
+import json
+
+import asks
+
+from asks.req_structs import CaseInsensitiveDict
+
+from garlic import Client
+
+PUBLISHED = "2020-07-01 00:00:00"
+
+
+def document(relays=(), bridges=(), **fields) -> dict:
+    """
+    Raw document holding `relays` and `bridges`.
+    """
+    return {
+        "version": "8.0",
+        "relays_published": PUBLISHED,
+        "bridges_published": PUBLISHED,
+        "relays": list(relays),
+        "bridges": list(bridges),
+        **fields,
+    }
+
+
+def relay_summary(fingerprint: str, nickname: str = "relay") -> dict:
+    return {"n": nickname, "f": fingerprint, "a": ["10.0.0.1"], "r": True}
+
+
+def response(status_code=200, body=b"", headers=None):
+    """
+    HTTP response, whose body is encoded as JSON unless it is bytes.
+    """
+    if not isinstance(body, bytes):
+        body = json.dumps(body).encode()
+    return asks.response_objects.Response(
+        encoding="utf-8",
+        http_version="1.1",
+        status_code=status_code,
+        reason_phrase="",
+        headers=CaseInsensitiveDict(headers or {}),
+        body=body,
+        method="GET",
+        url="",
+    )
+
+
+class FakeSession:
+    """
+    Session answering each request with the next reply, raising it if it is
+    an exception. A callable answers every request with its return value.
+    """
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.requests = []
+
+    async def request(self, verb, url, *args, **kwargs):
+        self.requests.append((verb, url, kwargs))
+        if len(self.replies) == 1 and callable(self.replies[0]):
+            reply = self.replies[0](verb, url, kwargs)
+        else:
+            reply = self.replies.pop(0)
+        if isinstance(reply, BaseException):
+            raise reply
+        return reply
+
+    async def close(self):
+        pass
+
+
+def client(session: FakeSession, **kwargs) -> Client:
+    """
+    Client issuing its requests through `session`.
+    """
+    client = Client(**kwargs)
+    client._session = session
+    return client
@@ -0,0 +1,104 @@
+import datetime as dt
+import os
+
+import pytest
+
+from garlic.archive import Archive
+from garlic.types import GraphHistory, RelayBandwidth, RelaySummary, Response
+
+PUBLISHED = dt.datetime(2020, 7, 1)
+
+
+def document(relays) -> Response:
+    return Response(
+        version="8.0",
+        relays_published=PUBLISHED,
+        bridges_published=PUBLISHED,
+        relays=relays,
+        bridges=[],
+    )
+
+
+def summary(nickname, fingerprint):
+    return RelaySummary(
+        nickname=nickname,
+        fingerprint=fingerprint,
+        addresses=["10.0.0.1"],
+        running=True,
+    )
+
+
+def test_round_trip(tmp_path):
+    history = GraphHistory.from_json(
+        {
+            "first": "2020-07-01 00:00:00",
+            "last": "2020-07-01 02:00:00",
+            "interval": 3600,
+            "factor": 0.5,
+            "count": 3,
+            "values": [2, None, 4],
+        }
+    )
+    relays = [
+        summary("first", "A" * 40),
+        RelayBandwidth(fingerprint="B" * 40, write_history={"1_day": history}),
+    ]
+    path = str(tmp_path / "document.archive")
+    Archive.write(document(relays), path)
+
+    with Archive(path) as archive:
+        response = archive.response()
+        assert response.version == "8.0"
+        assert response.relays_published == PUBLISHED
+        assert len(response.relays) == 2
+
+        first, second = response.relays
+        assert isinstance(first, RelaySummary)
+        assert (first.nickname, first.fingerprint) == ("first", "A" * 40)
+        assert first.addresses == ["10.0.0.1"] and first.running is True
+        assert isinstance(second, RelayBandwidth)
+        assert second.write_history == {"1_day": history}
+        assert second.read_history is None
+        assert archive.relays.value("nickname", 1) is None
+
+
+def test_column_exposes_fixed_width_values(tmp_path):
+    path = str(tmp_path / "document.archive")
+    Archive.write(document([summary("first", "A" * 40)]), path)
+
+    with Archive(path) as archive:
+        running = archive.relays.column("running")
+        assert running.tolist() == [1]
+        running.release()
+        with pytest.raises(TypeError):
+            archive.relays.column("addresses")
+
+
+def test_write_replaces_archive_without_disturbing_open_archives(tmp_path):
+    path = str(tmp_path / "document.archive")
+    Archive.write(document([summary("old", "A" * 40)]), path)
+
+    with Archive(path) as old:
+        Archive.write(
+            document([summary("new", "B" * 40), summary("x", "C" * 40)]), path
+        )
+        assert len(old.relays) == 1
+        assert old.relays[0].nickname == "old"
+
+    with Archive(path) as new:
+        assert [relay.nickname for relay in new.relays] == ["new", "x"]
+    assert os.listdir(tmp_path) == ["document.archive"]
+
+
+def test_failed_write_keeps_existing_archive(tmp_path):
+    path = str(tmp_path / "document.archive")
+    Archive.write(document([summary("old", "A" * 40)]), path)
+
+    unarchivable = summary("new", "B" * 40)
+    unarchivable.addresses = [object()]
+    with pytest.raises(TypeError):
+        Archive.write(document([unarchivable]), path)
+
+    with Archive(path) as archive:
+        assert archive.relays[0].nickname == "old"
+    assert os.listdir(tmp_path) == ["document.archive"]
@@ -0,0 +1,88 @@
+import datetime as dt
+
+import anyio
+
+from garlic.cache import Cache, CacheEntry, DiskBackend
+from garlic.types import PartialRawResponse
+
+from fakes import document
+
+
+def entry(size=10, ttl=60):
+    return CacheEntry(
+        PartialRawResponse(**document()),
+        dt.datetime.utcnow() + dt.timedelta(seconds=ttl),
+        "Wed, 01 Jul 2020 00:00:00 GMT",
+        size,
+    )
+
+
+def test_disk_backend_round_trip(tmp_path):
+    backend = DiskBackend(str(tmp_path / "cache.db"))
+
+    async def main():
+        stored = entry()
+        await backend.set(("a",), stored)
+        return stored, await backend.get(("a",)), await backend.get(("b",))
+
+    stored, retrieved, absent = anyio.run(main)
+    assert retrieved.value == stored.value
+    assert retrieved.last_modified == stored.last_modified
+    assert abs(retrieved.expires - stored.expires) < dt.timedelta(seconds=1)
+    assert absent is None
+
+
+def test_disk_backend_evicts_least_recently_used(tmp_path):
+    backend = DiskBackend(str(tmp_path / "cache.db"), max_entries=2)
+
+    async def main():
+        await backend.set(("a",), entry())
+        await backend.set(("b",), entry())
+        await backend.get(("a",))
+        evicted = await backend.set(("c",), entry())
+        return evicted, [await backend.get((key,)) is not None for key in "abc"]
+
+    assert anyio.run(main) == (1, [True, False, True])
+
+
+def test_disk_backend_honours_max_size(tmp_path):
+    backend = DiskBackend(str(tmp_path / "cache.db"), max_size=25)
+
+    async def main():
+        for key in "abc":
+            await backend.set((key,), entry(size=10))
+
+    anyio.run(main)
+    assert backend.usage() == (2, 20)
+
+
+def test_disk_backend_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "cache.db")
+    writer, reader = DiskBackend(path), DiskBackend(path)
+
+    async def main():
+        async with anyio.create_task_group() as tg:
+            for key in range(20):
+                await tg.spawn(writer.set, (key,), entry())
+        return [await reader.get((key,)) is not None for key in range(20)]
+
+    assert all(anyio.run(main))
+    assert writer.usage() == (20, 200)
+
+
+def test_disk_backend_usage_does_not_read_the_database(tmp_path):
+    path = tmp_path / "cache.db"
+    backend = DiskBackend(str(path))
+    anyio.run(backend.set, ("a",), entry())
+
+    path.unlink()
+    assert backend.usage() == (1, 10)
+
+
+def test_cache_purges_entries_which_cannot_be_revalidated(tmp_path):
+    cache = Cache(ttl=0, stale_ttl=0, backend=DiskBackend(str(tmp_path / "cache.db")))
+
+    # entries are purged when the cache is updated, once per lifetime.
+    anyio.run(cache.update, ("a",), PartialRawResponse(**document()))
+    assert cache.statistics.expirations == 1
+    assert cache.statistics.entries == 0
@@ -0,0 +1,169 @@
+import hashlib
+
+import anyio
+
+from garlic.client import ContentNotChanged, Endpoint
+
+from fakes import FakeSession, client, document, relay_summary, response
+
+FINGERPRINT = "A" * 40
+LAST_MODIFIED = "Wed, 01 Jul 2020 00:00:00 GMT"
+
+
+def test_fresh_entry_is_served_without_requesting():
+    session = FakeSession(
+        response(body=document([relay_summary(FINGERPRINT)])),
+    )
+    api = client(session, enable_cache=True)
+
+    async def main():
+        first = await api.get_summary()
+        second = await api.get_summary()
+        return first, second
+
+    first, second = anyio.run(main)
+    assert first.relays == second.relays
+    assert len(session.requests) == 1
+
+
+def test_expired_entry_is_revalidated():
+    session = FakeSession(
+        response(
+            body=document([relay_summary(FINGERPRINT)]),
+            headers={"Last-Modified": LAST_MODIFIED},
+        ),
+        response(status_code=304),
+    )
+    api = client(session, enable_cache=True, cache_ttl=0, cache_stale_ttl=60)
+
+    async def main():
+        await api.get_summary()
+        return await api.get_summary()
+
+    revalidated = anyio.run(main)
+    assert [relay.fingerprint for relay in revalidated.relays] == [FINGERPRINT]
+
+    _, _, kwargs = session.requests[1]
+    assert kwargs["headers"]["If-Modified-Since"] == LAST_MODIFIED
+    assert kwargs["follow_redirects"] is False
+    assert api.cache_statistics.revalidations == 1
+
+
+def test_conditional_request_returns_not_modified_response():
+    not_modified = response(status_code=304)
+    api = client(FakeSession(not_modified))
+
+    async def main():
+        return await api._exchange(
+            "GET",
+            "https://onionoo.torproject.org/summary",
+            headers={"If-Modified-Since": LAST_MODIFIED},
+        )
+
+    entry = anyio.run(main)
+    assert isinstance(entry.value, ContentNotChanged)
+    assert entry.value.response is not_modified
+
+
+def test_unconditional_requests_follow_redirects():
+    session = FakeSession(response(body=document()))
+    anyio.run(client(session).get_summary)
+
+    _, _, kwargs = session.requests[0]
+    assert "follow_redirects" not in kwargs
+
+
+def paged(count):
+    """
+    Handler answering `offset` and `limit` windows of `count` relays.
+    """
+    relays = [relay_summary(f"{index:040X}") for index in range(count)]
+
+    def handler(verb, url, kwargs):
+        params = kwargs["params"]
+        offset, limit = params.get("offset", 0), params.get("limit")
+        end = count if limit is None else min(count, offset + limit)
+        return response(
+            body=document(
+                relays[offset:end],
+                relays_skipped=offset,
+                relays_truncated=count - end,
+            )
+        )
+
+    return handler
+
+
+def test_iterator_requests_every_page():
+    session = FakeSession(paged(5))
+    api = client(session)
+
+    async def main():
+        return [relay.fingerprint async for relay in api.iter_summary(page_size=2)]
+
+    assert anyio.run(main) == [f"{index:040X}" for index in range(5)]
+    assert [kwargs["params"]["offset"] for _, _, kwargs in session.requests] == [
+        0,
+        2,
+        4,
+    ]
+
+
+def test_iterator_honours_offset_and_limit():
+    session = FakeSession(paged(10))
+    api = client(session)
+
+    async def main():
+        iterator = api.iter_summary(page_size=2, offset=3, limit=3)
+        return [relay.fingerprint async for relay in iterator]
+
+    assert anyio.run(main) == [f"{index:040X}" for index in range(3, 6)]
+    assert [kwargs["params"]["limit"] for _, _, kwargs in session.requests] == [2, 1]
+
+
+def test_iterator_prefetches_in_task_group():
+    session = FakeSession(paged(4))
+    api = client(session)
+
+    async def main():
+        consumed = []
+        async with anyio.create_task_group() as tg:
+            async for relay in api.iter_summary(page_size=2, task_group=tg):
+                # the following page is requested while this one is consumed.
+                await anyio.sleep(0)
+                consumed.append(len(session.requests))
+        return consumed
+
+    assert anyio.run(main) == [2, 2, 2, 2]
+
+
+def test_lookup_many_matches_hashed_relay_fingerprints_in_bulk():
+    hashed = hashlib.sha1(bytes.fromhex(FINGERPRINT)).hexdigest().upper()
+    session = FakeSession(response(body=document([relay_summary(FINGERPRINT)])))
+    api = client(session)
+
+    async def main():
+        # a bulk cost of zero always requests the whole document.
+        return await api.lookup_many(
+            [FINGERPRINT, hashed], document=Endpoint.SUMMARY, bulk_cost=0
+        )
+
+    found = anyio.run(main)
+    assert found[FINGERPRINT] is found[hashed]
+    assert "lookup" not in session.requests[0][2]["params"]
+
+
+def test_lookup_many_looks_up_each_fingerprint():
+    session = FakeSession(
+        lambda verb, url, kwargs: response(
+            body=document([relay_summary(kwargs["params"]["lookup"])])
+        )
+    )
+    api = client(session)
+    fingerprints = ["B" * 40, "C" * 40]
+
+    async def main():
+        return await api.lookup_many(fingerprints, document=Endpoint.SUMMARY)
+
+    assert list(anyio.run(main)) == fingerprints
+    assert len(session.requests) == 2
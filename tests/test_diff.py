@@ -0,0 +1,42 @@
+import copy
+
+from garlic.diff import digests, Delta
+from garlic.types import RelayBandwidth
+
+FINGERPRINT = "A" * 40
+
+
+def history(values):
+    return {
+        "3_days": {
+            "first": "2020-07-01 00:00:00",
+            "last": "2020-07-01 01:00:00",
+            "interval": 3600,
+            "factor": 0.5,
+            "count": len(values),
+            "values": values,
+        }
+    }
+
+
+def bandwidth(read_values):
+    return RelayBandwidth.from_json(
+        {
+            "fingerprint": FINGERPRINT,
+            "write_history": history([1, 2]),
+            "read_history": history(read_values),
+        }
+    )
+
+
+def test_only_changed_history_is_listed():
+    delta = Delta.between(digests([bandwidth([1, 2])]), digests([bandwidth([1, 3])]))
+
+    assert list(delta.changed) == [FINGERPRINT]
+    assert list(delta.changes[FINGERPRINT]) == ["read_history"]
+
+
+def test_identical_histories_are_equal():
+    old = bandwidth([1, 2])
+    assert old.read_history == copy.deepcopy(old.read_history)
+    assert not Delta.between(digests([old]), digests([bandwidth([1, 2])]))
@@ -0,0 +1,73 @@
+import datetime as dt
+
+import anyio
+import pytest
+
+from garlic.history import AsyncHistoryStore, HistoryStore
+from garlic.types import GraphHistory, RelayBandwidth
+
+FINGERPRINT = "A" * 40
+START = dt.datetime(2020, 7, 1)
+
+
+def history(first, values):
+    return GraphHistory(
+        START + dt.timedelta(hours=first),
+        START + dt.timedelta(hours=first + len(values) - 1),
+        dt.timedelta(hours=1),
+        0.5,
+        values,
+    )
+
+
+def test_overlapping_windows_extend_the_series():
+    with HistoryStore() as store:
+        assert store.add(FINGERPRINT, "read_history", "3_days", history(0, [2, 4])) == 2
+        assert (
+            store.add(FINGERPRINT, "read_history", "3_days", history(1, [4, None, 8]))
+            == 1
+        )
+
+        assert store.query(FINGERPRINT, "read_history", "3_days") == [
+            (START, 1.0),
+            (START + dt.timedelta(hours=1), 2.0),
+            (START + dt.timedelta(hours=3), 4.0),
+        ]
+        assert store.latest(
+            FINGERPRINT, "read_history", "3_days"
+        ) == START + dt.timedelta(hours=3)
+
+
+def test_ingest_names_series_by_metric_and_period(tmp_path):
+    relay = RelayBandwidth(
+        FINGERPRINT, {"1_month": history(0, [2])}, {"1_month": history(0, [4])}
+    )
+    with HistoryStore(str(tmp_path / "history.db")) as store:
+        assert store.ingest([relay]) == 2
+        assert sorted(store.series(FINGERPRINT)) == [
+            (FINGERPRINT, "read_history", "1_month"),
+            (FINGERPRINT, "write_history", "1_month"),
+        ]
+
+
+@pytest.mark.parametrize("path", [":memory:", "history.db"])
+def test_async_store_runs_in_worker_threads(tmp_path, path):
+    if path != ":memory:":
+        path = str(tmp_path / path)
+
+    async def main():
+        async with await AsyncHistoryStore.open(path) as store:
+            async with anyio.create_task_group() as tg:
+                for hour in range(10):
+                    await tg.spawn(
+                        store.add,
+                        FINGERPRINT,
+                        "read_history",
+                        "3_days",
+                        history(hour, [2]),
+                    )
+            return await store.query(
+                FINGERPRINT, "read_history", "3_days", end=START + dt.timedelta(hours=4)
+            )
+
+    assert [value for _, value in anyio.run(main)] == [1.0] * 5
@@ -0,0 +1,38 @@
+from garlic import utils
+from garlic.index import SearchIndex
+from garlic.types import BridgeBandwidth, BridgeSummary, RelayBandwidth, RelaySummary
+
+RELAY = "A" * 40
+BRIDGE = "B" * 40
+
+
+def test_relays_are_found_by_hashed_fingerprint():
+    relay = RelaySummary("relay", RELAY, ["10.0.0.1"], True)
+    index = SearchIndex([relay])
+
+    assert index.lookup(RELAY.lower()) is relay
+    assert index.lookup("$" + utils.hash_fingerprint(RELAY)) is relay
+
+
+def test_bridge_fingerprints_are_not_hashed_again():
+    bridges = [
+        BridgeSummary("bridge", BRIDGE, True),
+        BridgeBandwidth(BRIDGE),
+    ]
+    relay = RelayBandwidth(RELAY)
+    index = SearchIndex([*bridges, relay])
+
+    assert index.lookup(BRIDGE) is bridges[0]
+    assert index.position(utils.hash_fingerprint(BRIDGE)) is None
+
+
+def test_nicknames_are_searched_by_substring():
+    relays = [
+        RelaySummary("moria", RELAY, ["10.0.0.1"], True),
+        RelaySummary("amorphous", "C" * 40, ["[2001:db8::1]:443"], True),
+    ]
+    index = SearchIndex(relays)
+
+    assert index.by_nickname("mor", substring=True) == relays
+    assert index.by_nickname("mor") == relays[:1]
+    assert index.by_address("2001:db8") == relays[1:]
@@ -0,0 +1,33 @@
+import datetime as dt
+
+from garlic.query import QueryEngine
+from garlic.types import BridgeDetails, Response
+
+PUBLISHED = dt.datetime(2020, 7, 1)
+
+
+def bridge(nickname, hashed_fingerprint):
+    return BridgeDetails(
+        nickname=nickname,
+        hashed_fingerprint=hashed_fingerprint,
+        or_addresses=["10.0.0.1:443"],
+        last_seen=PUBLISHED,
+        first_seen=PUBLISHED,
+        running=True,
+    )
+
+
+def test_fingerprint_selects_bridge_by_hashed_fingerprint():
+    bridges = [bridge("first", "A" * 40), bridge("second", "B" * 40)]
+    engine = QueryEngine(
+        Response(
+            version="8.0",
+            relays_published=PUBLISHED,
+            bridges_published=PUBLISHED,
+            relays=[],
+            bridges=bridges,
+        )
+    )
+
+    assert engine.query(fingerprint="b" * 40).bridges == [bridges[1]]
+    assert engine.query(fingerprint="C" * 40).bridges == []
@@ -0,0 +1,106 @@
+import time
+
+import anyio
+import pytest
+
+from garlic.client import Endpoint
+from garlic.ratelimit import RateLimit, RateLimiter
+
+from fakes import FakeSession, client, document, response
+
+
+class SlowSession(FakeSession):
+    """
+    Session whose requests take `duration` seconds, recording the largest
+    number in flight at once.
+    """
+
+    def __init__(self, duration):
+        super().__init__(lambda verb, url, kwargs: response(body=document()))
+        self.duration = duration
+        self.in_flight = self.peak = 0
+
+    async def request(self, verb, url, *args, **kwargs):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await anyio.sleep(self.duration)
+            return await super().request(verb, url, *args, **kwargs)
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"rate": 0},
+        {"rate": -1},
+        {"rate": float("nan")},
+        {"burst": 0},
+        {"max_concurrency": 0},
+    ],
+)
+def test_limit_rejects_non_positive_bounds(kwargs):
+    with pytest.raises(ValueError):
+        RateLimit(**kwargs)
+
+
+def test_rate_paces_requests_after_burst():
+    limiter = RateLimiter(RateLimit(rate=20, burst=2))
+
+    async def main():
+        started = time.monotonic()
+        for _ in range(4):
+            async with limiter:
+                pass
+        return time.monotonic() - started
+
+    # two requests are admitted at once, the others wait 1/20 s each.
+    assert anyio.run(main) >= 0.09
+    statistics = limiter.statistics
+    assert statistics.requests == 4
+    assert statistics.delayed == 2
+    assert statistics.max_wait_time >= 0.04
+    assert statistics.waiting == statistics.in_flight == 0
+
+
+def test_max_concurrency_bounds_requests_in_flight():
+    session = SlowSession(0.01)
+    api = client(session, rate_limits={Endpoint.SUMMARY: RateLimit(max_concurrency=2)})
+
+    async def search(index):
+        await api.get_summary(search=str(index))
+
+    async def main():
+        async with anyio.create_task_group() as tg:
+            for index in range(5):
+                await tg.spawn(search, index)
+
+    anyio.run(main)
+    assert len(session.requests) == 5
+    assert session.peak == 2
+
+    statistics = api.rate_limit_statistics[Endpoint.SUMMARY]
+    assert statistics.requests == 5
+    assert statistics.delayed == 3
+    assert statistics.in_flight == 0
+
+
+def test_base_limit_applies_to_every_endpoint():
+    session = FakeSession(lambda verb, url, kwargs: response(body=document()))
+    api = client(
+        session,
+        rate_limits={
+            Endpoint.BASE: RateLimit(max_concurrency=1),
+            Endpoint.SUMMARY: RateLimit(max_concurrency=1),
+        },
+    )
+
+    async def main():
+        await api.get_summary()
+        await api.get_details()
+
+    anyio.run(main)
+    statistics = api.rate_limit_statistics
+    assert statistics[Endpoint.BASE].requests == 2
+    assert statistics[Endpoint.SUMMARY].requests == 1
@@ -0,0 +1,101 @@
+import anyio
+import pytest
+
+from garlic.exc import CircuitOpen, HTTPError, ServiceUnavailable
+from garlic.retry import CircuitBreaker, RetryPolicy
+
+from fakes import FakeSession, client, document, response
+
+# retries without waiting.
+POLICY = RetryPolicy(max_attempts=3, backoff=0, jitter=False)
+
+
+def test_retryable_status_is_retried():
+    session = FakeSession(
+        response(status_code=503), response(status_code=500), response(body=document())
+    )
+    anyio.run(client(session, retry_policy=POLICY).get_summary)
+    assert len(session.requests) == 3
+
+
+def test_last_response_is_returned_once_attempts_are_exhausted():
+    session = FakeSession(*[response(status_code=503)] * 3)
+    with pytest.raises(ServiceUnavailable):
+        anyio.run(client(session, retry_policy=POLICY).get_summary)
+    assert len(session.requests) == 3
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        ConnectionResetError(),
+        anyio.exceptions.ClosedResourceError(),
+        anyio.exceptions.IncompleteRead(),
+    ],
+)
+def test_connection_reset_is_retried(error):
+    session = FakeSession(error, response(body=document()))
+    anyio.run(client(session, retry_policy=POLICY).get_summary)
+    assert len(session.requests) == 2
+
+
+def test_unrelated_errors_are_not_retried():
+    session = FakeSession(KeyError("Location"), response(body=document()))
+    with pytest.raises(KeyError):
+        anyio.run(client(session, retry_policy=POLICY).get_summary)
+    assert len(session.requests) == 1
+
+
+def test_breaker_opens_after_consecutive_failed_requests():
+    policy = RetryPolicy(max_attempts=2, backoff=0, breaker_threshold=2)
+    session = FakeSession(lambda verb, url, kwargs: ConnectionResetError())
+    api = client(session, retry_policy=policy)
+
+    for _ in range(2):
+        with pytest.raises(HTTPError):
+            anyio.run(api.get_summary)
+    with pytest.raises(CircuitOpen):
+        anyio.run(api.get_summary)
+    # each failed request exhausted its attempts, the last was not issued.
+    assert len(session.requests) == 4
+
+
+def test_breaker_allows_a_single_trial_after_cooldown():
+    breaker = CircuitBreaker(threshold=1, cooldown=0)
+    breaker.record_failure()
+    assert breaker.allow()
+
+    breaker.cooldown = 60
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.allow()
+
+
+def test_retry_after_extends_the_delay():
+    policy = RetryPolicy(backoff=1, jitter=False)
+    assert policy.delay(0) == 1
+    assert policy.delay(2) == 4
+    assert policy.delay(0, retry_after=10) == 10
+    assert RetryPolicy(backoff=1, respect_retry_after=False).delay(0, 10) <= 1
+
+
+def test_retry_after_is_parsed():
+    assert RetryPolicy.parse_retry_after("120") == 120
+    assert RetryPolicy.parse_retry_after("Wed, 01 Jul 2020 00:00:00 GMT") == 0
+    assert RetryPolicy.parse_retry_after("soon") is None
+    assert RetryPolicy.parse_retry_after(None) is None
+
+
+def test_retry_after_header_delays_the_retry():
+    session = FakeSession(
+        response(status_code=503, headers={"Retry-After": "0.2"}),
+        response(body=document()),
+    )
+    api = client(session, retry_policy=POLICY)
+
+    async def main():
+        start = await anyio.current_time()
+        await api.get_summary()
+        return await anyio.current_time() - start
+
+    assert anyio.run(main) >= 0.2
@@ -0,0 +1,83 @@
+import gzip
+import json
+
+import anyio
+import pytest
+
+from garlic.client import Endpoint
+from garlic.stream import DocumentDecoder
+
+from fakes import FakeSession, client, document, relay_summary, response
+
+DOCUMENT = document(
+    [relay_summary("A" * 40, 'quo"ted'), relay_summary("B" * 40, "{brace]")],
+    [{"n": "bridge", "h": "C" * 40, "r": False}],
+    relays_truncated=0,
+)
+
+
+def decode(text, size):
+    decoder = DocumentDecoder()
+    elements = []
+    for start in range(0, len(text), size):
+        elements += decoder.feed(text[start : start + size])
+    decoder.close()
+    return decoder, elements
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 1000])
+def test_elements_are_decoded_across_chunks(size):
+    decoder, elements = decode(json.dumps(DOCUMENT, indent=1), size)
+
+    assert elements == [("relays", relay) for relay in DOCUMENT["relays"]] + [
+        ("bridges", bridge) for bridge in DOCUMENT["bridges"]
+    ]
+    assert decoder.fields["relays_truncated"] == 0
+    assert decoder.fields["version"] == "8.0"
+
+
+def test_truncated_document_is_rejected():
+    decoder = DocumentDecoder()
+    decoder.feed(json.dumps(DOCUMENT)[:-10])
+    with pytest.raises(ValueError):
+        decoder.close()
+
+
+class StreamBody:
+    """
+    Streamed body of a response, received `size` bytes at a time.
+    """
+
+    def __init__(self, body, size):
+        self.chunks = [
+            body[start : start + size] for start in range(0, len(body), size)
+        ]
+        self.decompress_data = True
+        self.closed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.closed = True
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
+def test_client_streams_gzip_document():
+    body = StreamBody(gzip.compress(json.dumps(DOCUMENT).encode()), 16)
+    streamed = response(headers={"Content-Encoding": "gzip"})
+    streamed.body = body
+    session = FakeSession(streamed)
+
+    async def main():
+        api = client(session)
+        return [descriptor async for descriptor in api.stream(Endpoint.SUMMARY)]
+
+    descriptors = anyio.run(main)
+    assert [relay.nickname for relay in descriptors[:2]] == ['quo"ted', "{brace]"]
+    assert descriptors[2].hashed_fingerprint == "C" * 40
+    assert body.closed
+    assert session.requests[0][2]["stream"] is True
@@ -0,0 +1,71 @@
+import datetime as dt
+import math
+
+import numpy as np
+
+from garlic import types
+from garlic.types import GraphHistory
+
+
+def history(values, factor=0.5):
+    return GraphHistory.from_json(
+        {
+            "first": "2020-07-01 00:00:00",
+            "last": "2020-07-01 02:00:00",
+            "interval": 3600,
+            "factor": factor,
+            "count": len(values),
+            "values": values,
+        }
+    )
+
+
+def test_values_are_float_array_with_nan_for_nulls():
+    values = history([2, None, 4]).values
+    assert values.dtype == np.float64
+    assert values[0] == 2 and math.isnan(values[1]) and values[2] == 4
+
+
+def test_denormalise_scales_values_in_place():
+    series = history([2, None, 4])
+    values = series.values
+    series.denormalise()
+
+    assert series.values is values
+    assert series.factor == 1
+    np.testing.assert_array_equal(series.to_array(), [1.0, np.nan, 2.0])
+
+
+def test_to_array_is_computed_once():
+    series = history([2, None, 4])
+    assert series.to_array() is series.to_array()
+    np.testing.assert_array_equal(series.to_array(), [1.0, np.nan, 2.0])
+    np.testing.assert_array_equal(series.to_array(denormalise=False), [2, np.nan, 4])
+
+
+def test_timestamps_are_interval_midpoints():
+    timestamps = history([1, 2, 3]).timestamps
+    assert timestamps[0] == np.datetime64(dt.datetime(2020, 7, 1), "s")
+    assert timestamps[-1] - timestamps[0] == np.timedelta64(2, "h")
+
+
+def test_histories_compare_by_value():
+    assert history([1, None]) == history([1, None])
+    assert history([1, None]) != history([1, 2])
+    assert history([1, 2]) != history([1, 2], factor=1)
+
+
+def test_repr_holds_every_value():
+    series = history([0.123456789] * 2000)
+    assert repr(series).count("0.123456789") == 2000
+
+
+def test_lists_are_used_without_numpy(monkeypatch):
+    monkeypatch.setattr(types, "np", None)
+    series = history([2, None, 4])
+    assert series.values == [2, None, 4]
+
+    series.denormalise()
+    assert series.values == [1.0, None, 2.0]
+    array = series.to_array()
+    assert array[0] == 1.0 and math.isnan(array[1])